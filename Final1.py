@@ -1,15 +1,19 @@
 # greensentinel_server.py pour la Raspberry Pi
-from flask import Flask, Response, render_template_string
-import cv2
-import numpy as np
+from flask import Flask, Response, jsonify, request
+import argparse
+import functools
+import hashlib
+import json
 import socket
-import time
 import threading
-from picamera2 import Picamera2
-from picamera2.encoders import JpegEncoder
-from picamera2.outputs import FileOutput
-import io
+import time
 import datetime
+from camera_sources import open_source
+from change_filter import ChangeFilter, FrameSignatures
+from frame_hub import FrameHub
+from metrics import Counter, Gauge, Histogram, registry
+from streaming_output import StreamingOutput
+from stream_variants import VariantCache
 
 app = Flask(__name__)
 
@@ -18,100 +22,270 @@ frame_width = 640
 frame_height = 480
 fps = 15
 quality = 80  # Qualité JPEG (0-100)
+camera_source = "picamera2"  # picamera2, synthetic, v4l2:0, file:video.mp4
+
+# Détection embarquée sur la Pi (export ONNX de try.pt, voir edge_detector.py)
+edge_inference = False
+edge_model = "try.onnx"
+edge_interval = 1.0  # Secondes entre deux analyses
+edge_size = 320      # Taille d'entrée du modèle exporté
+
+# Réglage adaptatif du flux (voir stream_controller.py) : quality et fps sont
+# les maxima, les minima bornent la dégradation sous charge
+adaptive = False
+min_quality = 40
+min_fps = 5
+min_scale = 0.5
+max_temperature = 75.0
+controller = None
+
+# Clips avant/après détection (voir clip_recorder.py)
+clip_directory = None  # Désactivé tant qu'aucun dossier n'est donné
+pre_roll = 5.0   # Secondes gardées en mémoire avant l'alerte
+post_roll = 5.0  # Secondes enregistrées après la dernière alerte
+recorder = None
 
-# Buffer circulaire pour le dernier frame
-latest_frame = None
-frame_lock = threading.Lock()
+# Historique des détections (voir event_store.py)
+history_directory = "detections"  # Vide : historique désactivé
+history = None
+
+# Diffusion des frames : chaque client est réveillé dès qu'un JPEG arrive
+hub = FrameHub()
+# Variantes du flux (?w=&q=&fps=) encodées une seule fois par frame
+variants = VariantCache(hub, max_width=frame_width, max_fps=fps)
+# Mode ?changes=1 : signatures des frames partagées entre les clients
+signatures = FrameSignatures()
 detection_count = 0
 last_detection_time = None
+detection_lock = threading.Lock()
+camera = None
 
-class StreamingOutput(io.BufferedIOBase):
-    def __init__(self):
-        self.frame = None
-        self.buffer = io.BytesIO()
-        self.condition = threading.Condition()
-
-    def write(self, buf):
-        if buf.startswith(b'\xff\xd8'):
-            # Nouveau frame JPEG
-            self.buffer.seek(0)
-            self.buffer.truncate()
-            self.buffer.write(buf)
-            with self.condition:
-                self.frame = self.buffer.getvalue()
-                self.condition.notify_all()
-        else:
-            self.buffer.write(buf)
-        return len(buf)
+# État publié en direct aux tableaux de bord (/events)
+status_hub = FrameHub()
+status_interval = 5  # Secondes entre deux mises à jour de santé
+viewer_count = 0
+dashboard_cache = None  # (page, etag) rendus une seule fois
 
-# Initialisation de la caméra en mode haute performance
+# Métriques Prometheus exposées sur /metrics
+metrics_enabled = True
+frames_captured = Counter("greensentinel_frames_captured_total",
+                          "Frames JPEG produites par l'encodeur")
+frame_bytes = Histogram("greensentinel_frame_bytes", "Taille des frames JPEG encodées",
+                        buckets=(10e3, 20e3, 40e3, 80e3, 160e3, 320e3, 640e3))
+client_frames = Counter("greensentinel_client_frames_sent_total",
+                        "Frames envoyées à chaque client")
+client_dropped = Counter("greensentinel_client_frames_dropped_total",
+                         "Frames sautées par chaque client trop lent")
+viewers = Gauge("greensentinel_viewers", "Clients connectés à /video_feed")
+frames_suppressed = Counter("greensentinel_frames_suppressed_total",
+                            "Frames non envoyées car inchangées (?changes=1)")
+bytes_saved = Counter("greensentinel_bytes_saved_total",
+                      "Octets non envoyés grâce au mode ?changes=1")
+stream_quality = Gauge("greensentinel_stream_quality", "Qualité JPEG courante du flux")
+stream_fps = Gauge("greensentinel_stream_fps", "Fps demandé courant du flux")
+stream_width = Gauge("greensentinel_stream_width", "Largeur courante des frames encodées")
+lock_wait = Histogram("greensentinel_hub_lock_wait_seconds",
+                      "Attente du verrou du hub à chaque publication",
+                      buckets=(1e-6, 1e-5, 1e-4, 1e-3, 1e-2))
+
+# Initialisation de la caméra : elle chauffe en arrière-plan pendant que le
+# serveur accepte déjà les connexions
 def initialize_camera():
-    camera = Picamera2()
-    camera_config = camera.create_video_configuration(
-        main={"size": (frame_width, frame_height), "format": "RGB888"},
-        controls={"FrameRate": fps},
-        buffer_count=4
-    )
-    camera.configure(camera_config)
-    
-    # Configurer l'encodeur JPEG en mémoire
-    encoder = JpegEncoder(q=quality)
-    output = StreamingOutput()
-    camera.start_recording(encoder, FileOutput(output))
+    camera = open_source(camera_source, frame_width, frame_height, fps, quality)
+    output = StreamingOutput(hub)
+    camera.start_in_background(output)
     
     return camera, output
 
-# Thread pour capturer les frames
-def capture_frames(output):
-    global latest_frame
-    
+# Enregistre une détection (appelé depuis le thread de détection embarquée)
+def record_detection(detections=None):
+    global detection_count, last_detection_time
+    with detection_lock:
+        detection_count += 1
+        last_detection_time = datetime.datetime.now().strftime("%H:%M:%S")
+    # Les détections simulées (démonstration) ne déclenchent pas de clip et ne
+    # sont pas conservées
+    if recorder is not None and detections is not None:
+        recorder.trigger()
+    if history is not None and detections is not None:
+        history.add(socket.gethostname() or "pi", detections)
+    publish_status()
+
+# Adresse IP de la Pi, résolue une seule fois
+@functools.lru_cache(maxsize=None)
+def get_ip():
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.connect(("8.8.8.8", 80))
+        ip = s.getsockname()[0]
+        s.close()
+    except OSError:
+        ip = "localhost"
+    return ip
+
+capture_fps = 0.0
+
+def current_status():
+    width, height = camera.scaled_size() if camera is not None else (frame_width, frame_height)
+    return {
+        "detections": detection_count,
+        "last_detection": last_detection_time,
+        "alert": detection_count > 0,
+        "camera_ready": camera is not None and camera.ready.is_set(),
+        "capture_fps": round(capture_fps, 1),
+        "viewers": viewer_count,
+        "width": width,
+        "height": height,
+        "fps": camera.fps if camera is not None else fps,
+        "quality": camera.quality if camera is not None else quality,
+    }
+
+# Pousse l'état courant à tous les abonnés de /events
+def publish_status():
+    status_hub.publish(current_status())
+
+# Thread de santé : fps de capture mesuré et état de la caméra
+def monitor_health():
+    global capture_fps
+    last_seq, last_time = hub.seq, time.monotonic()
     while True:
-        with output.condition:
-            output.condition.wait()
-            # Mettre à jour le frame avec un lock pour éviter les conflits
-            with frame_lock:
-                latest_frame = output.frame
+        time.sleep(status_interval)
+        now = time.monotonic()
+        capture_fps = (hub.seq - last_seq) / (now - last_time)
+        last_seq, last_time = hub.seq, now
+        publish_status()
+
+# Réglage du flux changé par le contrôleur adaptatif
+def stream_adapted():
+    stream_quality.set(camera.quality)
+    stream_fps.set(camera.fps)
+    stream_width.set(camera.scaled_size()[0])
+    publish_status()
 
-# Fonction pour simuler une détection (à remplacer par vos vraies détections)
+# Fonction pour simuler une détection (démonstration sans détection embarquée)
 def simulate_detection():
-    global detection_count, last_detection_time
-    detection_count += 1
-    last_detection_time = datetime.datetime.now().strftime("%H:%M:%S")
+    record_detection()
+
+# Comptage des frames produites par l'encodeur (abonné au hub)
+def count_frame(seq, frame):
+    frames_captured.inc()
+    frame_bytes.observe(len(frame))
 
 # Fonction pour générer le flux vidéo
-def generate_frames():
-    while True:
-        # Récupérer le dernier frame disponible
-        with frame_lock:
-            if latest_frame is not None:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + latest_frame + b'\r\n')
-                       
-        # Contrôle de débit pour réduire la charge CPU
-        time.sleep(1/fps)
+def generate_frames(variant=None, client="", changes=None):
+    global viewer_count
+    # Le client attend la prochaine frame du hub : pas de sondage ni de doublon
+    frames = hub.subscribe() if variant is None else variants.subscribe(variant)
+    viewers.inc()
+    with detection_lock:
+        viewer_count += 1
+    last_seq = 0
+    try:
+        for seq, frame in frames:
+            skipped = seq - last_seq - 1 if last_seq else 0
+            if skipped > 0:
+                client_dropped.inc(skipped, client=client)
+            last_seq = seq
+            suppressed = changes is not None and not changes.check(seq, frame)
+            # Frames sautées par un client trop lent : signal de saturation réseau.
+            # Les variantes sautent des frames exprès (fps réduit), elles ne comptent pas,
+            # ni les frames supprimées qui ne passent pas par le réseau
+            if controller is not None and variant is None:
+                controller.client_frame(max(skipped, 0), sent=0 if suppressed else 1)
+            if suppressed:
+                frames_suppressed.inc()
+                bytes_saved.inc(len(frame))
+                continue
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n'
+                   b'Content-Length: %d\r\n\r\n' % len(frame) + frame + b'\r\n')
+            client_frames.inc(client=client)
+    finally:
+        viewers.dec()
+        with detection_lock:
+            viewer_count -= 1
+        client_frames.remove(client=client)
+        client_dropped.remove(client=client)
 
 # Route pour diffuser le flux vidéo
 @app.route('/video_feed')
 def video_feed():
-    return Response(generate_frames(),
+    variant = variants.from_args(request.args, quality)
+    # ?changes=1[&delta=0.005&keyframe=10] : seulement les frames qui ont changé
+    changes = ChangeFilter.from_args(request.args, signatures,
+                                     variant=variant.key if variant is not None else None)
+    client = f"{request.remote_addr}:{request.environ.get('REMOTE_PORT', '')}"
+    return Response(generate_frames(variant, client, changes),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+# Métriques au format Prometheus
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+# État courant en JSON
+@app.route('/status')
+def status():
+    return jsonify(current_status())
+
+# Historique : détections d'une période (?since=&until=&camera=&class=&limit=)
+@app.route('/api/detections')
+def detection_history():
+    return history_response(history and history.api(request.args))
+
+# Historique résumé par tranche (?since=&until=&camera=&step=secondes)
+@app.route('/api/detections/summary')
+def detection_summary():
+    return history_response(history and history.api(request.args, summary=True))
+
+def history_response(result):
+    if history is None:
+        return jsonify({"error": "historique désactivé"}), 404
+    if result is None:
+        return jsonify({"error": "paramètre invalide"}), 400
+    return jsonify(result)
+
+# Flux server-sent events : une mise à jour à chaque détection et à chaque
+# relevé de santé, plus un commentaire de maintien si rien ne se passe
+def generate_events():
+    seq = 0
+    yield b'data: ' + json.dumps(current_status()).encode() + b'\n\n'
+    while True:
+        seq, update = status_hub.wait_next(seq, timeout=15)
+        if update is None:
+            yield b': keepalive\n\n'
+        else:
+            yield b'data: ' + json.dumps(update).encode() + b'\n\n'
+
+@app.route('/events')
+def events():
+    response = Response(generate_events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 # Page d'accueil avec design attractif
 @app.route('/')
 def index():
-    # Obtenir l'adresse IP
-    try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(("8.8.8.8", 80))
-        ip = s.getsockname()[0]
-        s.close()
-    except:
-        ip = "localhost"
+    global dashboard_cache
     
     # Simuler une détection pour démonstration
-    if detection_count == 0:
+    if detection_count == 0 and not edge_inference:
         simulate_detection()
-        
+    
+    # Page statique rendue une seule fois ; le navigateur la revalide par ETag
+    if dashboard_cache is None:
+        dashboard_cache = render_dashboard()
+    page, etag = dashboard_cache
+    response = Response(page, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# En pleine résolution, le navigateur reçoit une variante réduite du flux
+def preview_url():
+    return '/video_feed' if frame_width <= 640 else '/video_feed?w=640'
+
+def render_dashboard():
     # HTML template avec design vert et thème GreenSentinel
     template = """
     <!DOCTYPE html>
@@ -320,7 +494,7 @@ def index():
                 <h2>Surveillance en direct</h2>
                 <p>Flux vidéo provenant du capteur de la Raspberry Pi</p>
                 <br>
-                <img src="/video_feed" class="video-feed" alt="Flux vidéo en direct">
+                <img src="{{ preview }}" class="video-feed" alt="Flux vidéo en direct">
             </div>
             
             <div class="status-panel">
@@ -328,16 +502,19 @@ def index():
                     <h3>État du système</h3>
                     <div class="info-grid">
                         <span class="info-label">État:</span>
-                        <span><span class="status-indicator status-active"></span> Actif</span>
+                        <span><span class="status-indicator status-warning" id="camera-indicator"></span> <span id="camera-state">Démarrage</span></span>
                         
                         <span class="info-label">Résolution:</span>
-                        <span class="info-value">{{ width }}x{{ height }} @ {{ fps }} FPS</span>
+                        <span class="info-value" id="resolution">{{ width }}x{{ height }} @ {{ fps }} FPS</span>
                         
                         <span class="info-label">URL du flux:</span>
                         <span class="info-value">http://{{ ip }}:5000/video_feed</span>
                         
                         <span class="info-label">Qualité image:</span>
-                        <span class="info-value">{{ quality }}%</span>
+                        <span class="info-value" id="quality">{{ quality }}%</span>
+                        
+                        <span class="info-label">Spectateurs:</span>
+                        <span class="info-value" id="viewers">0</span>
                     </div>
                 </div>
                 
@@ -345,58 +522,203 @@ def index():
                     <h3>Détection d'incendies</h3>
                     <div class="info-grid">
                         <span class="info-label">Nombre de détections:</span>
-                        <span class="info-value">{{ detections }}</span>
+                        <span class="info-value" id="detections">0</span>
                         
                         <span class="info-label">Dernière détection:</span>
-                        <span class="info-value">{{ last_detection }}</span>
+                        <span class="info-value" id="last-detection">Aucune</span>
                         
                         <span class="info-label">État d'alerte:</span>
-                        <span><span class="status-indicator {{ 'status-danger' if detections > 0 else 'status-active' }}"></span>
-                        {{ 'Alerte active' if detections > 0 else 'Normal' }}</span>
+                        <span><span class="status-indicator status-active" id="alert-indicator"></span>
+                        <span id="alert-state">Normal</span></span>
                         
                         <span class="info-label">Modèle IA:</span>
                         <span class="info-value">YOLO (try.pt)</span>
                     </div>
                 </div>
+                
+                <div class="status-card">
+                    <h3>Historique (7 jours)</h3>
+                    <div class="info-grid" id="history">
+                        <span class="info-label">Détections:</span>
+                        <span class="info-value">Aucune</span>
+                    </div>
+                </div>
             </div>
         </div>
         
         <footer>
             <p>GreenSentinel &copy; 2025 | Système de détection d'incendies par intelligence artificielle</p>
         </footer>
+        
+        <script>
+            // Mises à jour poussées par le serveur (/events), sans recharger la page
+            function applyStatus(status) {
+                document.getElementById('detections').textContent = status.detections;
+                document.getElementById('last-detection').textContent = status.last_detection || 'Aucune';
+                document.getElementById('alert-indicator').className =
+                    'status-indicator ' + (status.alert ? 'status-danger' : 'status-active');
+                document.getElementById('alert-state').textContent = status.alert ? 'Alerte active' : 'Normal';
+                document.getElementById('camera-indicator').className =
+                    'status-indicator ' + (status.camera_ready ? 'status-active' : 'status-warning');
+                document.getElementById('camera-state').textContent =
+                    status.camera_ready ? 'Actif (' + status.capture_fps + ' FPS)' : 'Démarrage';
+                document.getElementById('viewers').textContent = status.viewers;
+                // Réglages courants du flux (ajustés sous charge avec --adaptive)
+                document.getElementById('resolution').textContent =
+                    status.width + 'x' + status.height + ' @ ' + status.fps + ' FPS';
+                document.getElementById('quality').textContent = status.quality + '%';
+            }
+            fetch('/status').then(function (r) { return r.json(); }).then(applyStatus);
+            new EventSource('/events').onmessage = function (event) {
+                applyStatus(JSON.parse(event.data));
+            };
+            // Frames avec détection par jour, depuis le résumé de l'historique
+            fetch('/api/detections/summary?step=86400').then(function (r) {
+                return r.ok ? r.json() : {summary: []};
+            }).then(function (history) {
+                var days = {};
+                history.summary.forEach(function (row) {
+                    var day = new Date(row.time * 1000).toLocaleDateString();
+                    days[day] = (days[day] || 0) + row.frames;
+                });
+                var grid = document.getElementById('history');
+                if (Object.keys(days).length) {
+                    grid.innerHTML = '';
+                }
+                Object.keys(days).forEach(function (day) {
+                    var label = document.createElement('span');
+                    label.className = 'info-label';
+                    label.textContent = day + ':';
+                    var value = document.createElement('span');
+                    value.className = 'info-value';
+                    value.textContent = days[day] + ' frames';
+                    grid.appendChild(label);
+                    grid.appendChild(value);
+                });
+            });
+        </script>
     </body>
     </html>
     """
     
-    return render_template_string(template,
-                                  width=frame_width,
-                                  height=frame_height,
-                                  fps=fps,
-                                  ip=ip,
-                                  quality=quality,
-                                  detections=detection_count,
-                                  last_detection=last_detection_time or "Aucune")
+    page = app.jinja_env.from_string(template).render(width=frame_width,
+                                                      height=frame_height,
+                                                      fps=fps,
+                                                      ip=get_ip(),
+                                                      quality=quality,
+                                                      preview=preview_url())
+    return page, hashlib.sha1(page.encode()).hexdigest()
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serveur GreenSentinel pour la Raspberry Pi')
+    parser.add_argument('--no-metrics', action='store_true',
+                        help='Désactiver les métriques /metrics')
+    parser.add_argument('--width', type=int, default=frame_width,
+                        help='Largeur de capture (ex. 4056 : pleine résolution pour l\'inférence par tuiles)')
+    parser.add_argument('--height', type=int, default=frame_height,
+                        help='Hauteur de capture')
+    parser.add_argument('--fps', type=int, default=fps,
+                        help='Images par seconde (maximum en mode adaptatif)')
+    parser.add_argument('--quality', type=int, default=quality,
+                        help='Qualité JPEG (maximum en mode adaptatif)')
+    parser.add_argument('--camera', type=str, default=camera_source,
+                        help='Source vidéo: picamera2, synthetic, v4l2:0, file:video.mp4')
+    parser.add_argument('--edge', action='store_true',
+                        help='Activer la détection embarquée sur la Pi')
+    parser.add_argument('--edge-model', type=str, default=edge_model,
+                        help='Modèle ONNX exporté depuis try.pt')
+    parser.add_argument('--edge-interval', type=float, default=edge_interval,
+                        help='Secondes entre deux analyses')
+    parser.add_argument('--edge-size', type=int, default=edge_size,
+                        help='Taille d\'entrée du modèle exporté')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Adapter qualité, fps et résolution à la charge (CPU, température, clients lents)')
+    parser.add_argument('--min-quality', type=int, default=min_quality,
+                        help='Qualité JPEG minimale en mode adaptatif')
+    parser.add_argument('--min-fps', type=int, default=min_fps,
+                        help='Fps minimal en mode adaptatif')
+    parser.add_argument('--min-scale', type=float, default=min_scale,
+                        help='Réduction de résolution maximale en mode adaptatif (1, 0.75, 0.5 ou 0.25)')
+    parser.add_argument('--max-temperature', type=float, default=max_temperature,
+                        help='Température du SoC (°C) à partir de laquelle le flux est dégradé')
+    parser.add_argument('--transport-port', type=int, default=None,
+                        help='Port du transport binaire vers le PC (ex. 5001, voir frame_transport.py)')
+    parser.add_argument('--history', type=str, default=history_directory,
+                        help='Dossier de l\'historique des détections (vide pour désactiver)')
+    parser.add_argument('--clips', type=str, default=clip_directory,
+                        help='Dossier des clips enregistrés à chaque détection')
+    parser.add_argument('--pre-roll', type=float, default=pre_roll,
+                        help='Secondes de vidéo gardées avant la détection')
+    parser.add_argument('--post-roll', type=float, default=post_roll,
+                        help='Secondes de vidéo enregistrées après la détection')
+    args = parser.parse_args()
+    edge_inference = args.edge
+    camera_source = args.camera
+    frame_width, frame_height = args.width, args.height
+    fps, quality = args.fps, args.quality
+    variants.max_width = frame_width
+    variants.max_fps = fps
+    metrics_enabled = not args.no_metrics
+    registry.enabled = metrics_enabled
+    if metrics_enabled:
+        hub.add_listener(count_frame)
+        hub.lock_wait = lock_wait
+    
+    # Journal des détections ; compteurs repris là où le dernier lancement s'est arrêté
+    if args.history:
+        from event_store import EventStore
+        history = EventStore(args.history).start()
+        detection_count, last = history.totals()
+        if last is not None:
+            last_detection_time = datetime.datetime.fromtimestamp(last).strftime("%H:%M:%S")
+        print(f"Historique des détections: {args.history} ({detection_count} frames avec détection)")
+    
+    # Anneau des dernières frames, vidé sur disque à chaque détection
+    if args.clips:
+        from clip_recorder import ClipRecorder
+        recorder = ClipRecorder(hub, args.clips, pre_seconds=args.pre_roll,
+                                post_seconds=args.post_roll, fps=fps,
+                                width=frame_width, height=frame_height).start()
+        print(f"Clips de détection: {args.clips} ({args.pre_roll} s avant, {args.post_roll} s après)")
+    
     # Initialiser la caméra
     camera, output = initialize_camera()
     
-    # Démarrer le thread de capture
-    capture_thread = threading.Thread(target=capture_frames, args=(output,), daemon=True)
-    capture_thread.start()
+    # Qualité, fps et résolution ajustés à la volée, dans les bornes de l'opérateur
+    if args.adaptive:
+        from stream_controller import AdaptiveController
+        controller = AdaptiveController(camera, hub, max_quality=quality,
+                                        min_quality=args.min_quality, max_fps=fps,
+                                        min_fps=args.min_fps, min_scale=args.min_scale,
+                                        max_temperature=args.max_temperature,
+                                        on_change=stream_adapted).start()
+        stream_adapted()
+        print(f"Flux adaptatif: qualité {args.min_quality}-{quality}, {args.min_fps}-{fps} FPS, "
+              f"échelle min {args.min_scale}")
     
-    # Obtenir l'adresse IP
-    try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(("8.8.8.8", 80))
-        ip = s.getsockname()[0]
-        s.close()
-    except:
-        ip = "localhost"
+    # Démarrer la détection embarquée, indépendante du flux vidéo
+    if edge_inference:
+        from edge_detector import EdgeDetector
+        detector = EdgeDetector(hub, args.edge_model, record_detection,
+                                interval=args.edge_interval, input_size=args.edge_size).start()
+        print(f"Détection embarquée: {args.edge_model} toutes les {args.edge_interval} s")
+    
+    # Transport binaire pour le client PC (en-tête seq/horodatage, sans HTTP)
+    if args.transport_port:
+        from frame_transport import FrameServer
+        FrameServer(hub, port=args.transport_port).start()
+        print(f"Transport binaire sur le port {args.transport_port}")
     
-    print(f"GreenSentinel démarré sur http://{ip}:5000")
+    # Relevés de santé poussés aux tableaux de bord
+    threading.Thread(target=monitor_health, daemon=True).start()
+    
+    print(f"GreenSentinel démarré sur http://{get_ip()}:5000")
     print(f"Streaming vidéo: {frame_width}x{frame_height} @ {fps} FPS")
     
     # Démarrer le serveur Flask avec des paramètres optimisés
-    app.run(host='0.0.0.0', port=5000, threaded=True)
+    try:
+        app.run(host='0.0.0.0', port=5000, threaded=True)
+    finally:
+        if history is not None:
+            history.stop()
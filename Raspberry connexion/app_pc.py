@@ -3,9 +3,26 @@ import cv2
 import numpy as np
 import requests
 import time
-from threading import Thread
+from threading import Event, Thread
 import argparse
-from ultralytics import YOLO
+import functools
+import os
+import sys
+
+# Modules partagés à la racine du dépôt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from event_store import EventStore
+from frame_hub import FrameHub
+from frame_transport import FORMATS, MODE_PULL, MODE_STREAM, FrameClient, to_bgr
+from gating import MotionFireGate
+from inference_pool import InferencePool
+from metrics import Histogram, registry
+from mjpeg_parser import MJPEGParser, iter_chunks
+from model_cache import BACKENDS, load_model
+from pipeline import BatchStage, Packet, PoolStage, Stage
+from restream import AnnotatedStreamServer
+from tiling import TiledDetector, TiledResult
+from tracker import BoxTracker, detections_from, draw_tracks
 
 # Argument pour l'adresse IP de la Raspberry Pi
 parser = argparse.ArgumentParser(description='Client de détection d\'incendies avec Ultralytics YOLO')
@@ -13,23 +30,89 @@ parser.add_argument('--ip', type=str, default='172.22.2.178',
                    help='Adresse IP de la Raspberry Pi')
 parser.add_argument('--port', type=str, default='5000',
                    help='Port du serveur Flask sur la Raspberry Pi')
+parser.add_argument('--cameras', type=str, nargs='+', default=None,
+                   help='Liste de caméras ip:port (remplace --ip/--port)')
+parser.add_argument('--transport', choices=['http', 'tcp'], default='http',
+                   help='http : flux MJPEG /video_feed ; tcp : transport binaire (Final1.py --transport-port)')
+parser.add_argument('--format', choices=list(FORMATS), default='jpeg',
+                   help='Format des frames en transport tcp')
+parser.add_argument('--frame-width', type=int, default=0,
+                   help='Largeur des frames brutes (gray/yuv420) en transport tcp, 0 : pleine taille')
+parser.add_argument('--pull', action='store_true',
+                   help='Transport tcp : ne demander que la frame la plus récente quand on est prêt')
 parser.add_argument('--conf', type=float, default=0.6,
                    help='Seuil de confiance pour les prédictions')
+parser.add_argument('--gate', action='store_true',
+                   help='Filtrer les frames statiques (mouvement / couleur de feu) avant YOLO')
+parser.add_argument('--heartbeat', type=float, default=5.0,
+                   help='Intervalle max sans inférence complète quand le filtre est actif (s)')
+parser.add_argument('--detect-every', type=int, default=1,
+                   help='YOLO toutes les N frames, boîtes suivies par flux optique entre deux (1 : toujours YOLO)')
+parser.add_argument('--tiles', type=int, default=0,
+                   help='Inférence par tuiles de N pixels sur les flux haute résolution (0 : image entière)')
+parser.add_argument('--serve', type=int, default=None,
+                   help='Mode sans écran : flux annotés et détections en HTTP sur ce port')
+parser.add_argument('--backend', choices=BACKENDS, default='auto',
+                   help='Runtime d\'inférence (auto : OpenVINO ou ONNX Runtime si installé, sinon PyTorch)')
+parser.add_argument('--int8', action='store_true',
+                   help='Modèle exporté quantifié en INT8')
+parser.add_argument('--calibration', type=str, default=None,
+                   help='Jeu de calibration (yaml Ultralytics) pour l\'INT8 OpenVINO')
+parser.add_argument('--imgsz', type=int, default=640,
+                   help='Taille d\'entrée du modèle exporté')
+parser.add_argument('--workers', type=int, default=0,
+                   help='Processus d\'inférence (0 : dans ce processus ; -1 : un par cœur)')
+parser.add_argument('--pool-depth', type=int, default=2,
+                   help='Frames en vol par caméra avec --workers (1 avec --detect-every)')
+parser.add_argument('--history', type=str, default='detections',
+                   help='Dossier de l\'historique des détections (vide pour désactiver)')
+parser.add_argument('--metrics-port', type=int, default=None,
+                   help='Exposer les métriques Prometheus sur ce port (/metrics)')
+parser.add_argument('--no-metrics', action='store_true',
+                   help='Désactiver les métriques')
+parser.add_argument('--stats-interval', type=float, default=10,
+                   help='Période d\'affichage des statistiques par caméra (s)')
 args = parser.parse_args()
 
-# URL du flux vidéo de la Raspberry Pi
-url = f'http://{args.ip}:{args.port}/video_feed'
+# URL du flux vidéo de chaque Raspberry Pi
+cameras = args.cameras or [f'{args.ip}:{args.port}']
+if args.transport == 'tcp':
+    urls = [f'tcp://{camera}' for camera in cameras]
+else:
+    urls = [f'http://{camera}/video_feed' for camera in cameras]
+
+# Histogrammes des étapes du chemin critique
+registry.enabled = not args.no_metrics
+receive_time = Histogram("app_pc_receive_seconds",
+                         "Durée de réception d'une frame complète depuis la précédente")
+decode_time = Histogram("app_pc_decode_seconds", "Durée du décodage JPEG")
+predict_time = Histogram("app_pc_predict_seconds", "Durée d'un appel à model.predict")
+plot_time = Histogram("app_pc_plot_seconds", "Durée du dessin des résultats")
+encode_time = Histogram("app_pc_encode_seconds", "Durée de l'encodage JPEG des frames annotées")
+
+# Un seul modèle en mémoire pour toutes les caméras. Les processus d'inférence
+# (--workers) réimportent ce script sous le nom __mp_main__ et chargent le leur
+if __name__ != '__mp_main__':
+    print("Chargement du modèle de détection d'incendies...")
+    # Exporté une fois vers le runtime choisi puis relu depuis .model_cache ; avec
+    # --workers, ce chargement remplit le cache avant le démarrage des processus
+    model = load_model("try.pt", backend=args.backend, imgsz=args.imgsz, int8=args.int8,
+                       data=args.calibration, warmup=not args.workers)
 
-# Charger le modèle YOLOv8 pour la détection d'incendies
-print("Chargement du modèle de détection d'incendies...")
-model = YOLO("try.pt")  # Chargement du modèle YOLOv8 préentraîné
+# Un suivi par caméra quand YOLO ne tourne pas à chaque frame
+trackers = ({url: BoxTracker(every=args.detect_every) for url in urls}
+            if args.detect_every > 1 else None)
+# Découpage en tuiles par caméra : seules les tuiles actives passent par YOLO
+tilers = {url: TiledDetector(tile=args.tiles) for url in urls} if args.tiles else None
 
-# Classe pour gérer le flux vidéo en streaming
+# Classe pour gérer le flux vidéo en streaming : le thread réseau ne fait que
+# découper les JPEG et les publier, le décodage se fait dans l'étage suivant
 class VideoStreamingClient:
     def __init__(self, url):
         self.url = url
-        self.bytes = bytes()
-        self.frame = None
+        # Seule l'image la plus récente de chaque lecture est transmise
+        self.parser = MJPEGParser(mode='latest')
+        self.frames = FrameHub()
         self.stopped = False
         self.thread = Thread(target=self.update, daemon=True)
         self.thread.start()
@@ -42,64 +125,320 @@ class VideoStreamingClient:
                 self.stopped = True
                 return
                 
-            for chunk in r.iter_content(chunk_size=1024):
-                self.bytes += chunk
-                a = self.bytes.find(b'\xff\xd8')
-                b = self.bytes.find(b'\xff\xd9')
-                if a != -1 and b != -1:
-                    jpg = self.bytes[a:b+2]
-                    self.bytes = self.bytes[b+2:]
-                    self.frame = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            start = time.perf_counter()
+            for chunk in iter_chunks(r.raw):
+                for jpg in self.parser.feed(chunk):
+                    now = time.perf_counter()
+                    receive_time.observe(now - start)
+                    start = now
+                    self.frames.publish(Packet(jpg, self.url))
                 if self.stopped:
                     break
         except Exception as e:
             print(f"Erreur lors de la récupération du flux vidéo: {e}")
             self.stopped = True
     
-    def read(self):
-        return self.frame
+    def stop(self):
+        self.stopped = True
+        self.frames.close()
+        if self.thread.is_alive():
+            self.thread.join()
+
+# Client du transport binaire : pas de marqueurs à chercher, les frames
+# arrivent avec leur numéro et leur heure de capture
+class FrameTransportClient:
+    def __init__(self, url):
+        self.url = url
+        host, _, port = url[len('tcp://'):].rpartition(':')
+        self.address = (host, int(port))
+        self.frames = FrameHub()
+        self.client = None
+        # Mode pull : prochaine frame demandée quand l'inférence a fini la précédente
+        self.demand = Event()
+        self.demand.set()
+        self.stopped = False
+        self.thread = Thread(target=self.update, daemon=True)
+        self.thread.start()
+    
+    def request(self, *args):
+        self.demand.set()
+    
+    def update(self):
+        try:
+            self.client = FrameClient(*self.address, mode=MODE_PULL if args.pull else MODE_STREAM,
+                                      fmt=FORMATS[args.format], width=args.frame_width)
+            start = time.perf_counter()
+            while not self.stopped:
+                if args.pull:
+                    # Délai max : une frame perdue en route ne bloque pas le flux
+                    self.demand.wait(timeout=1.0)
+                    self.demand.clear()
+                header, payload = self.client.read()
+                now = time.perf_counter()
+                receive_time.observe(now - start)
+                start = now
+                self.frames.publish(Packet(payload, self.url, header))
+        except Exception as e:
+            if not self.stopped:
+                print(f"Erreur lors de la récupération du flux vidéo: {e}")
+            self.stopped = True
     
     def stop(self):
         self.stopped = True
+        self.frames.close()
+        if self.client is not None:
+            self.client.close()
         if self.thread.is_alive():
             self.thread.join()
 
+# Étages du pipeline : chacun reçoit le paquet le plus récent de l'étage précédent
+def decode(packet, gate=None):
+    with decode_time.time():
+        if packet.header is not None:
+            packet.image = to_bgr(packet.header, packet.jpeg)
+        else:
+            packet.image = cv2.imdecode(np.frombuffer(packet.jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if packet.image is None:
+        return None
+    if gate is not None:
+        packet.analyse = gate.check(packet.image)
+    return packet
+
+def infer(packets):
+    # Un seul predict pour la dernière frame de chaque caméra à analyser ;
+    # avec le suivi, seules les caméras dont le tracker le demande passent par YOLO
+    todo = [packet for packet in packets if packet.analyse and
+            (trackers is None or trackers[packet.source].needs_detection())]
+    if todo and tilers is not None:
+        predict_tiles(todo)
+    elif todo:
+        with predict_time.time():
+            results = model.predict(source=[packet.image for packet in todo],
+                                    conf=args.conf, verbose=False)
+        for packet, result in zip(todo, results):
+            packet.results = result
+    for packet in packets:
+        track(packet)
+        record(packet)
+    return packets
+
+# Met à jour le suivi de la caméra avec les détections de la frame, s'il y en a
+def track(packet):
+    if trackers is None or not packet.analyse:
+        return
+    tracker = trackers[packet.source]
+    if packet.results is not None:
+        tracker.update(packet.image, *detections_from(packet.results))
+    else:
+        tracker.update(packet.image)
+    packet.tracks = tracker.snapshot()
+
+# Historique des détections (--history), créé par DetectionPipeline
+history = None
+camera_names = dict(zip(urls, cameras))
+
+# Ajoute à l'historique les détections YOLO de la frame (pas les boîtes suivies),
+# datées de la capture sur la Pi quand le transport binaire la transmet
+def record(packet):
+    if history is None or packet.results is None:
+        return
+    boxes, confs, classes = detections_from(packet.results)
+    if len(boxes):
+        # 0 : heure de capture inconnue de la Pi
+        timestamp = packet.header.timestamp if packet.header is not None else 0.0
+        timestamp = timestamp or packet.received
+        history.add(camera_names[packet.source], list(zip(classes, confs, boxes)), timestamp)
+
+# Avec --workers : images d'une frame à confier au pool (aucune, la frame, ou ses tuiles)
+def prepare(packet):
+    if not packet.analyse or (trackers is not None and not trackers[packet.source].needs_detection()):
+        return []
+    if tilers is not None:
+        packet.tiles = tilers[packet.source].plan(packet.image)
+        return TiledDetector.crops(packet.image, packet.tiles)
+    return [packet.image]
+
+# Détections revenues du pool, dans l'ordre des frames de chaque caméra
+def finish(packet, detections):
+    if packet.tiles is not None:
+        packet.results = tilers[packet.source].merge(packet.image, packet.tiles, detections,
+                                                     model.names)
+    elif detections:
+        packet.results = TiledResult(packet.image, *detections[0], model.names)
+    track(packet)
+    record(packet)
+    return packet
+
+def predict_tiles(packets):
+    # Tuiles actives de toutes les caméras dans un seul lot, puis fusion par caméra
+    plans = [tilers[packet.source].plan(packet.image) for packet in packets]
+    crops = [crop for packet, tiles in zip(packets, plans)
+             for crop in TiledDetector.crops(packet.image, tiles)]
+    with predict_time.time():
+        results = model.predict(source=crops, conf=args.conf, verbose=False)
+    detections = iter([detections_from(result) for result in results])
+    for packet, tiles in zip(packets, plans):
+        packet.results = tilers[packet.source].merge(
+            packet.image, tiles, [next(detections) for _ in tiles], model.names)
+
+# Serveur de re-diffusion (mode --serve), créé dans main()
+restream = None
+
+def annotate(packet):
+    # Sans écran : rien à dessiner tant que personne ne regarde cette caméra
+    if restream is not None and not restream.watched(packet.source):
+        return packet
+    # Dessiner les résultats sur le frame (les frames filtrées restent brutes)
+    if packet.tracks is not None:
+        with plot_time.time():
+            packet.image = draw_tracks(packet.image, packet.tracks, model.names)
+    elif packet.results is not None:
+        with plot_time.time():
+            packet.image = packet.results.plot()
+    if restream is not None:
+        # Encodé une fois ici, envoyé tel quel à tous les spectateurs
+        with encode_time.time():
+            packet.annotated = cv2.imencode('.jpg', packet.image, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+    return packet
+
+# Détections d'un paquet en JSON (pistes si le suivi est actif)
+def describe(packet):
+    if packet.tracks is not None:
+        return [{"track_id": track_id, "box": [round(float(v), 1) for v in box],
+                 "class": model.names[cls], "conf": round(float(conf), 3),
+                 "growth": round(float(growth), 2)}
+                for track_id, box, cls, conf, growth in packet.tracks]
+    if packet.results is None:
+        return []
+    boxes, confs, classes = detections_from(packet.results)
+    return [{"box": [round(float(v), 1) for v in box], "class": model.names[int(cls)],
+             "conf": round(float(conf), 3)}
+            for box, conf, cls in zip(boxes, confs, classes)]
+
+# Clients, étages de décodage, inférence groupée et annotation pour toutes les caméras
+class DetectionPipeline:
+    def __init__(self):
+        global history
+        if args.history:
+            history = EventStore(args.history, names=model.names).start()
+        # Un client de streaming vidéo et un étage de décodage par caméra
+        self.clients, self.decoders, self.gates = [], [], []
+        for camera, url in zip(cameras, urls):
+            print(f"Connexion au flux vidéo: {url}")
+            client = FrameTransportClient(url) if args.transport == 'tcp' else VideoStreamingClient(url)
+            self.clients.append(client)
+            gate = MotionFireGate(heartbeat=args.heartbeat) if args.gate else None
+            self.gates.append(gate)
+            self.decoders.append(Stage(f"décodage {camera}",
+                                       functools.partial(decode, gate=gate), client.frames).start())
+        
+        # Inférence groupée sur toutes les caméras, ou répartie sur un pool de
+        # processus (--workers), puis annotation par caméra
+        sources = [stage.sink for stage in self.decoders]
+        self.pool = None
+        if args.workers:
+            self.pool = InferencePool(
+                workers=None if args.workers < 0 else args.workers, conf=args.conf,
+                model_options=dict(weights="try.pt", backend=args.backend, imgsz=args.imgsz,
+                                   int8=args.int8, data=args.calibration)).start()
+            print(f"Démarrage de {self.pool.workers} processus d'inférence...")
+            if not self.pool.wait_ready():
+                raise RuntimeError("Aucun processus d'inférence n'a pu charger le modèle")
+            # Le suivi a besoin du résultat d'une frame pour décider de la suivante
+            depth = 1 if trackers is not None else args.pool_depth
+            self.batcher = PoolStage("inférence", self.pool, sources, prepare, finish,
+                                     depth=depth).start()
+        else:
+            self.batcher = BatchStage("inférence", infer, sources).start()
+        self.annotators = [Stage(f"annotation {camera}", annotate, sink).start()
+                           for camera, sink in zip(cameras, self.batcher.sinks)]
+        if args.transport == 'tcp' and args.pull:
+            for client, sink in zip(self.clients, self.batcher.sinks):
+                sink.add_listener(client.request)
+    
+    @property
+    def stopped(self):
+        return all(client.stopped for client in self.clients)
+    
+    def stop(self):
+        for client in self.clients:
+            client.stop()
+        for stage in self.decoders + [self.batcher] + self.annotators:
+            stage.stop()
+        if self.pool is not None:
+            self.pool.stop()
+        if history is not None:
+            history.stop()
+    
+    def print_stats(self):
+        print(self.batcher.stats(cameras))
+        if history is not None:
+            print(f"  {history.stats()}")
+        for camera, client in zip(cameras, self.clients):
+            if isinstance(client, FrameTransportClient) and client.client is not None:
+                print(f"  {camera} transport: {client.client.received} reçues, "
+                      f"{client.client.skipped} jamais reçues")
+        for camera, url, gate in zip(cameras, urls, self.gates):
+            if gate is not None:
+                print(f"  {camera} {gate.stats()}")
+            if trackers is not None:
+                print(f"  {camera} {trackers[url].stats()}")
+            if tilers is not None:
+                print(f"  {camera} {tilers[url].stats()}")
+
+# Mode service : pas de fenêtre, résultats disponibles en HTTP
+def serve(pipeline):
+    global restream
+    restream = AnnotatedStreamServer(
+        [(camera, url, stage.sink) for camera, url, stage in zip(cameras, urls, pipeline.annotators)],
+        describe, port=args.serve, history=history).start()
+    print(f"Flux annotés et détections sur http://localhost:{args.serve}/")
+    try:
+        while not pipeline.stopped:
+            time.sleep(args.stats_interval)
+            pipeline.print_stats()
+    except KeyboardInterrupt:
+        print("Arrêt du client...")
+    finally:
+        restream.shutdown()
+        pipeline.stop()
+        pipeline.print_stats()
+
 # Fonction principale
 def main():
-    # Créer l'instance du client de streaming vidéo
-    print(f"Connexion au flux vidéo: {url}")
-    client = VideoStreamingClient(url)
-    
-    # Attendre que la connexion soit établie
-    time.sleep(2)
+    if args.metrics_port and registry.enabled:
+        registry.serve(args.metrics_port)
+        print(f"Métriques disponibles sur http://localhost:{args.metrics_port}/metrics")
+    pipeline = DetectionPipeline()
+    if args.serve:
+        serve(pipeline)
+        return
     
     try:
-        while not client.stopped:
-            # Récupérer le frame actuel
-            frame = client.read()
+        # L'affichage reste dans le thread principal (exigence d'OpenCV)
+        seqs = [0] * len(cameras)
+        last_stats = time.time()
+        while not pipeline.stopped:
+            for i, stage in enumerate(pipeline.annotators):
+                seq, packet = stage.sink.wait_next(seqs[i], timeout=0)
+                if packet is not None:
+                    seqs[i] = seq
+                    cv2.imshow(f'Détection d\'incendies - {cameras[i]}', packet.image)
             
-            # Si un frame est disponible, détecter les incendies
-            if frame is not None:
-                # Détecter les incendies avec YOLO
-                results = model.predict(source=frame, conf=args.conf, verbose=False)
-                
-                # Dessiner les résultats sur le frame
-                annotated_frame = results[0].plot()
-                
-                # Afficher le résultat
-                cv2.imshow('Détection d\'incendies', annotated_frame)
-                
-                # Quitter si la touche 'q' est pressée
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
-            else:
-                time.sleep(0.1)
+            if time.time() - last_stats >= args.stats_interval:
+                pipeline.print_stats()
+                last_stats = time.time()
+            
+            # Quitter si la touche 'q' est pressée
+            if cv2.waitKey(5) & 0xFF == ord('q'):
+                break
     
     except KeyboardInterrupt:
         print("Arrêt du client...")
     finally:
         # Nettoyer
-        client.stop()
+        pipeline.stop()
+        pipeline.print_stats()
         cv2.destroyAllWindows()
 
 if __name__ == "__main__":
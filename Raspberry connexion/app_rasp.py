@@ -1,23 +1,34 @@
 # app.py pour la Raspberry Pi
 from flask import Flask, Response
-import io
-from picamera2 import Picamera2
-import time
 import threading
 import socket
-import numpy as np
-import cv2
 
 app = Flask(__name__)
 
-# Configuration de la caméra avec Picamera2
-camera = Picamera2()
-camera_config = camera.create_preview_configuration(main={"size": (640, 480)})
-camera.configure(camera_config)
-camera.start()
+# Caméra démarrée en arrière-plan : le serveur répond pendant qu'elle s'initialise
+camera = None
+camera_ready = threading.Event()  # Démarrage terminé, réussi ou non
+camera_error = None  # Erreur de démarrage de la caméra, le cas échéant
+CAMERA_TIMEOUT = 10  # Secondes d'attente de la caméra par requête
+
+# Configuration de la caméra avec Picamera2 (import différé, module lourd)
+def start_camera():
+    global camera, camera_error
+    try:
+        from picamera2 import Picamera2
+        camera = Picamera2()
+        camera_config = camera.create_preview_configuration(main={"size": (640, 480)})
+        camera.configure(camera_config)
+        camera.start()
+    except Exception as e:
+        camera_error = e
+        print(f"Erreur de démarrage de la caméra: {e}")
+    finally:
+        camera_ready.set()
 
 # Fonction pour capturer une image et la convertir en JPEG
 def capture_jpeg():
+    import cv2
     frame = camera.capture_array()
     # Convertir en BGR (si nécessaire) puis en JPEG
     if len(frame.shape) == 2:  # Si l'image est en niveaux de gris
@@ -35,6 +46,10 @@ def generate_frames():
 # Route pour diffuser le flux vidéo
 @app.route('/video_feed')
 def video_feed():
+    # Caméra en échec ou toujours pas prête : 503 au lieu d'un flux qui ne vient jamais
+    if not camera_ready.wait(CAMERA_TIMEOUT) or camera_error is not None:
+        reason = camera_error or "caméra en cours de démarrage"
+        return Response(f"Caméra indisponible: {reason}\n", status=503, mimetype='text/plain')
     return Response(generate_frames(),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
@@ -64,8 +79,8 @@ def index():
     """
 
 if __name__ == '__main__':
-    # Attendre que la caméra s'initialise
-    time.sleep(2)
+    # La caméra s'initialise pendant que le serveur démarre
+    threading.Thread(target=start_camera, daemon=True).start()
     
     # Tentative d'obtenir l'adresse IP locale
     try:
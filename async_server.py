@@ -0,0 +1,212 @@
+# async_server.py - serveur asyncio pour la Raspberry Pi : une seule boucle
+# d'événements pousse les frames à tous les clients MJPEG (pas un thread par client)
+import argparse
+import asyncio
+import socket
+import time
+
+from camera_sources import open_source
+from frame_hub import FrameHub
+from streaming_output import StreamingOutput
+
+PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n'
+STREAM_HEADERS = (b'HTTP/1.1 200 OK\r\n'
+                  b'Content-Type: multipart/x-mixed-replace; boundary=frame\r\n'
+                  b'Cache-Control: no-cache, private\r\n'
+                  b'Connection: close\r\n\r\n')
+
+INDEX_PAGE = """<html>
+  <head>
+    <title>Détection d'incendies - Raspberry Pi</title>
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <style>
+        body {{ font-family: Arial, sans-serif; text-align: center; margin: 20px; }}
+        img {{ max-width: 100%; height: auto; border: 1px solid #ddd; }}
+        .info {{ background-color: #f5f5f5; padding: 10px; border-radius: 5px; margin-top: 20px; }}
+    </style>
+  </head>
+  <body>
+    <h1>Flux vidéo de la Raspberry Pi</h1>
+    <img src="/video_feed" />
+    <div class="info">
+        <p>URL du flux vidéo: <code>http://{ip}:{port}/video_feed</code></p>
+        <p>Résolution: {width}x{height} @ {fps} FPS</p>
+    </div>
+  </body>
+</html>
+"""
+
+
+def get_ip():
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.connect(("8.8.8.8", 80))
+        ip = s.getsockname()[0]
+        s.close()
+    except OSError:
+        ip = "localhost"
+    return ip
+
+
+class StreamClient:
+    def __init__(self, writer):
+        self.writer = writer
+        self.transport = writer.transport
+        self.last_seq = 0
+        self.sent = 0
+        self.dropped = 0
+        self.stalled_since = None
+
+
+class AsyncStreamServer:
+    # max_pending_frames : au-delà de ce nombre de frames non envoyées dans le
+    # tampon d'un client, ses frames suivantes sont sautées (contre-pression).
+    # stall_timeout : un client bloqué plus longtemps est déconnecté.
+    def __init__(self, hub, width, height, fps, max_pending_frames=1, stall_timeout=30):
+        self.hub = hub
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.max_pending_frames = max_pending_frames
+        self.stall_timeout = stall_timeout
+        self.clients = set()
+        self.last_seq = 0
+        self.loop = None
+        self.server = None
+        self.index_page = b''
+
+    async def start(self, host='0.0.0.0', port=5000):
+        self.loop = asyncio.get_running_loop()
+        page = INDEX_PAGE.format(ip=get_ip(), port=port, width=self.width,
+                                 height=self.height, fps=self.fps).encode()
+        self.index_page = (b'HTTP/1.1 200 OK\r\n'
+                           b'Content-Type: text/html; charset=utf-8\r\n'
+                           b'Content-Length: %d\r\n'
+                           b'Connection: close\r\n\r\n' % len(page)) + page
+        self.hub.add_listener(self._on_frame)
+        self.server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        return self.server
+
+    # Appelé dans le thread de l'encodeur : on passe la main à la boucle
+    def _on_frame(self, seq, frame):
+        self.loop.call_soon_threadsafe(self.broadcast, seq, frame)
+
+    def broadcast(self, seq, data):
+        # Une frame plus récente est déjà en attente dans la boucle : on saute celle-ci
+        if seq <= self.last_seq or seq < self.hub.seq:
+            return
+        self.last_seq = seq
+        header = PART_HEADER % len(data)
+        limit = self.max_pending_frames * (len(header) + len(data) + 2)
+        now = time.monotonic()
+        for client in list(self.clients):
+            transport = client.transport
+            if transport.is_closing():
+                self.clients.discard(client)
+                continue
+            if seq <= client.last_seq:
+                continue
+            if transport.get_write_buffer_size() > limit:
+                # Client lent : il recevra la frame la plus récente plus tard
+                client.dropped += 1
+                if client.stalled_since is None:
+                    client.stalled_since = now
+                elif now - client.stalled_since > self.stall_timeout:
+                    transport.abort()
+                    self.clients.discard(client)
+                continue
+            client.stalled_since = None
+            transport.write(header)
+            transport.write(data)
+            transport.write(b'\r\n')
+            client.last_seq = seq
+            client.sent += 1
+
+    async def handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 10)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        parts = request.split(b'\r\n', 1)[0].split()
+        path = parts[1].split(b'?', 1)[0] if len(parts) > 1 else b''
+
+        if path == b'/':
+            writer.write(self.index_page)
+            await self._close(writer)
+        elif path == b'/video_feed':
+            await self.stream(reader, writer)
+        else:
+            writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n'
+                         b'Connection: close\r\n\r\n')
+            await self._close(writer)
+
+    async def stream(self, reader, writer):
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        writer.write(STREAM_HEADERS)
+        client = StreamClient(writer)
+        # Le nouveau client reçoit tout de suite la dernière frame connue
+        client.last_seq, frame = self.hub.seq, self.hub.frame
+        if frame is not None:
+            writer.write(PART_HEADER % len(frame))
+            writer.write(bytes(frame))
+            writer.write(b'\r\n')
+        self.clients.add(client)
+        try:
+            # Rien à lire : on attend simplement la déconnexion du client
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+
+    async def _close(self, writer):
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+
+async def serve(args):
+    hub = FrameHub()
+    # La caméra chauffe en arrière-plan pendant que le serveur accepte déjà les clients
+    camera = open_source('synthetic' if args.fake else args.camera,
+                         args.width, args.height, args.fps, args.quality)
+    camera.start_in_background(StreamingOutput(hub))
+
+    server = AsyncStreamServer(hub, args.width, args.height, args.fps)
+    await server.start(args.host, args.port)
+    print(f"Serveur asyncio démarré sur http://{get_ip()}:{args.port}")
+    print(f"Streaming vidéo: {args.width}x{args.height} @ {args.fps} FPS")
+    async with server.server:
+        await server.server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serveur de streaming asyncio pour la Raspberry Pi')
+    parser.add_argument('--host', type=str, default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--fps', type=int, default=15)
+    parser.add_argument('--quality', type=int, default=80,
+                        help='Qualité JPEG (0-100)')
+    parser.add_argument('--camera', type=str, default='picamera2',
+                        help='Source vidéo: picamera2, synthetic, v4l2:0, file:video.mp4')
+    parser.add_argument('--fake', action='store_true',
+                        help='Raccourci pour --camera synthetic (tests sans Pi)')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("Arrêt du serveur...")
+
+
+if __name__ == '__main__':
+    main()
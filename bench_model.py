@@ -0,0 +1,121 @@
+# bench_model.py - runtimes d'inférence comparés au modèle PyTorch d'origine
+# Pour chaque runtime : temps de démarrage à froid (export compris) et avec
+# le cache, images par seconde, et accord des détections avec PyTorch
+# (boîtes appariées à IoU 0.5, écart moyen de confiance).
+#   python bench_model.py --images photos/ --backends torch onnx openvino
+#   python bench_model.py --video feu.mp4 --int8 --output bench_model.json
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+
+import cv2
+import numpy as np
+
+from model_cache import load_model
+from tracker import box_iou, detections_from
+
+
+def read_images(args):
+    if args.video:
+        capture = cv2.VideoCapture(args.video)
+        images = []
+        while len(images) < args.frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            images.append(frame)
+        capture.release()
+        return images
+    paths = sorted(glob.glob(os.path.join(args.images, '*.jpg')))[:args.frames]
+    return [cv2.imread(path) for path in paths]
+
+
+# Appariement glouton par classe ; retourne (appariées, IoU moyen, écart de confiance)
+def agreement(reference, candidate):
+    matched, ious, deltas = 0, [], []
+    for (ref_boxes, ref_confs, ref_classes), (boxes, confs, classes) in zip(reference, candidate):
+        used = set()
+        overlaps = box_iou(ref_boxes, boxes)
+        for row, (conf, cls) in enumerate(zip(ref_confs, ref_classes)):
+            best, best_iou = None, 0.5
+            for index, other_cls in enumerate(classes):
+                if index in used or other_cls != cls:
+                    continue
+                if overlaps[row, index] >= best_iou:
+                    best, best_iou = index, float(overlaps[row, index])
+            if best is not None:
+                used.add(best)
+                matched += 1
+                ious.append(best_iou)
+                deltas.append(abs(float(conf) - float(confs[best])))
+    total = sum(len(boxes) for boxes, _, _ in reference)
+    return (matched / total if total else 1.0,
+            float(np.mean(ious)) if ious else 0.0,
+            float(np.mean(deltas)) if deltas else 0.0)
+
+
+def run(model, images, conf):
+    detections = []
+    start = time.perf_counter()
+    for image in images:
+        detections.append(detections_from(model.predict(source=image, conf=conf, verbose=False)[0]))
+    return detections, len(images) / max(time.perf_counter() - start, 1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparaison des runtimes d\'inférence')
+    parser.add_argument('--weights', type=str, default='try.pt')
+    parser.add_argument('--images', type=str, default='static/photos',
+                        help='Dossier de JPEG de test')
+    parser.add_argument('--video', type=str, default=None, help='Vidéo de test (prioritaire)')
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx', 'openvino'])
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--int8', action='store_true')
+    parser.add_argument('--calibration', type=str, default=None,
+                        help='Jeu de calibration (yaml Ultralytics) pour l\'INT8 OpenVINO')
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--cache-dir', type=str, default='.model_cache_bench',
+                        help='Cache vidé au départ pour mesurer le démarrage à froid')
+    parser.add_argument('--output', type=str, default=None, help='Résultats JSON')
+    args = parser.parse_args()
+
+    images = read_images(args)
+    if not images:
+        parser.error("aucune image de test")
+    shutil.rmtree(args.cache_dir, ignore_errors=True)
+    print(f"{len(images)} images, {args.weights}, imgsz {args.imgsz}{', INT8' if args.int8 else ''}")
+    print(f"{'runtime':>9} {'froid':>7} {'cache':>7} {'img/s':>7} {'accord':>7} {'IoU':>6} {'Δconf':>6}")
+    results = []
+    # Référence de l'accord : toujours le modèle PyTorch d'origine
+    reference, _ = run(load_model(args.weights, backend='torch', imgsz=args.imgsz, warmup=False),
+                       images, args.conf)
+    for backend in args.backends:
+        timings = []
+        for _ in range(2):
+            # Premier chargement : export éventuel ; second : relu depuis le cache
+            start = time.perf_counter()
+            model = load_model(args.weights, backend=backend, imgsz=args.imgsz, int8=args.int8,
+                               cache_dir=args.cache_dir, data=args.calibration)
+            timings.append(time.perf_counter() - start)
+        if model.backend != backend:
+            print(f"{backend:>9} indisponible")
+            continue
+        detections, fps = run(model, images, args.conf)
+        matched, mean_iou, conf_delta = agreement(reference, detections)
+        results.append({"backend": backend, "cold_start_s": timings[0], "cached_start_s": timings[1],
+                        "fps": fps, "matched": matched, "mean_iou": mean_iou,
+                        "conf_delta": conf_delta})
+        print(f"{backend:>9} {timings[0]:>6.1f}s {timings[1]:>6.1f}s {fps:>7.1f} "
+              f"{matched:>7.1%} {mean_iou:>6.3f} {conf_delta:>6.3f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"images": len(images), "imgsz": args.imgsz, "int8": args.int8,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
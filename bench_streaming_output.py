@@ -0,0 +1,83 @@
+# bench_streaming_output.py - octets copiés par frame, ancienne vs nouvelle StreamingOutput
+import argparse
+import io
+import os
+import threading
+import time
+
+from streaming_output import StreamingOutput
+
+# Tailles typiques d'un JPEG q=80 produit par la Pi
+FRAME_SIZES = {
+    "640x480": 45 * 1024,
+    "1920x1080": 320 * 1024,
+}
+
+
+# Ancienne implémentation (Final1.py / optimize.py) instrumentée
+class LegacyStreamingOutput(io.BufferedIOBase):
+    def __init__(self):
+        self.frame = None
+        self.buffer = io.BytesIO()
+        self.condition = threading.Condition()
+        self.bytes_copied = 0
+
+    def write(self, buf):
+        if buf[:2] == b'\xff\xd8':
+            self.buffer.seek(0)
+            self.buffer.truncate()
+            self.buffer.write(buf)
+            with self.condition:
+                self.frame = self.buffer.getvalue()
+                self.condition.notify_all()
+            # Une copie dans le BytesIO ; getvalue() lui emprunte son tampon, que
+            # l'écriture suivante devra réallouer
+            self.bytes_copied += len(buf)
+        else:
+            self.buffer.write(buf)
+            self.bytes_copied += len(buf)
+        return len(buf)
+
+
+def make_frame(size):
+    return b'\xff\xd8' + os.urandom(size - 4) + b'\xff\xd9'
+
+
+def run(output, frames, reuse_buffer):
+    # reuse_buffer simule un encodeur qui réécrit toujours le même tampon
+    shared = bytearray(frames[0])
+    elapsed = 0.0
+    for frame in frames:
+        if reuse_buffer:
+            shared[:] = frame
+            frame = memoryview(shared)
+        # Seul le temps passé dans write() est mesuré
+        start = time.perf_counter()
+        output.write(frame)
+        elapsed += time.perf_counter() - start
+    return output.bytes_copied / len(frames), elapsed / len(frames) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de StreamingOutput')
+    parser.add_argument('--frames', type=int, default=500,
+                        help='Nombre de frames par mesure')
+    args = parser.parse_args()
+
+    print(f"{'résolution':<10} {'variante':<28} {'octets copiés/frame':>20} {'µs/frame':>10}")
+    for name, size in FRAME_SIZES.items():
+        # Quelques frames différentes pour éviter les effets de cache
+        frames = [make_frame(size) for _ in range(8)] * (args.frames // 8)
+        cases = [
+            ("avant (bytes)", LegacyStreamingOutput(), False),
+            ("après (bytes par référence)", StreamingOutput(), False),
+            ("avant (tampon réutilisé)", LegacyStreamingOutput(), True),
+            ("après (tampon réutilisé)", StreamingOutput(), True),
+        ]
+        for label, output, reuse in cases:
+            copied, us = run(output, frames, reuse)
+            print(f"{name:<10} {label:<28} {copied:>20.0f} {us:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
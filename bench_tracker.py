@@ -0,0 +1,160 @@
+# bench_tracker.py - dérive du suivi (YOLO toutes les N frames) face à YOLO à chaque frame
+# La référence est la détection complète sur chaque frame ; pour chaque N on
+# mesure le recouvrement des boîtes suivies avec la référence, le rappel et
+# la précision à IoU 0.5, les changements d'identifiant et le coût par frame.
+#   python bench_tracker.py                          # scène synthétique, détecteur parfait
+#   python bench_tracker.py --video feu.mp4 --model try.pt
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from tracker import BoxTracker, box_iou, detections_from
+
+
+# Position qui rebondit entre 0 et limit
+def bounce(position, limit):
+    position = abs(position) % (2 * limit)
+    return int(2 * limit - position if position > limit else position)
+
+
+# Scène synthétique : fond texturé qui dérive (caméra qui bouge un peu) et
+# foyers texturés qui se déplacent et grandissent
+class SyntheticScene:
+    def __init__(self, width=640, height=480, fires=3, seed=0):
+        rng = np.random.default_rng(seed)
+        self.width = width
+        self.height = height
+        noise = rng.integers(0, 255, (height // 8 + 8, width // 8 + 8), dtype=np.uint8)
+        self.background = cv2.cvtColor(cv2.resize(noise, None, fx=8, fy=8,
+                                                  interpolation=cv2.INTER_CUBIC),
+                                       cv2.COLOR_GRAY2BGR)
+        self.fires = [dict(x=rng.uniform(80, width - 160), y=rng.uniform(80, height - 160),
+                           size=rng.uniform(30, 60), vx=rng.uniform(-3, 3), vy=rng.uniform(-2, 2),
+                           grow=rng.uniform(1.0, 1.01))
+                      for _ in range(fires)]
+        texture = rng.integers(0, 120, (64, 64), dtype=np.uint8)
+        self.flame = np.dstack([texture // 4, 80 + texture, 135 + texture])  # BGR orangé
+
+    def frame(self, index):
+        dx = int(24 + 20 * np.sin(index / 20))
+        image = self.background[32:32 + self.height, dx:dx + self.width].copy()
+        boxes = []
+        for fire in self.fires:
+            side = min(max(int(fire['size'] * fire['grow'] ** index), 8), self.height // 3)
+            x1 = bounce(fire['x'] + fire['vx'] * index, self.width - side)
+            y1 = bounce(fire['y'] + fire['vy'] * index, self.height - side)
+            image[y1:y1 + side, x1:x1 + side] = cv2.resize(self.flame, (side, side))
+            boxes.append((x1, y1, x1 + side, y1 + side))
+        boxes = np.asarray(boxes, dtype=np.float32)
+        return image, (boxes, np.full(len(boxes), 0.9, np.float32), np.zeros(len(boxes), int))
+
+
+def reference_detections(frames, detect):
+    start = time.perf_counter()
+    detections = [detect(index, image) for index, image in enumerate(frames)]
+    return detections, (time.perf_counter() - start) / len(frames)
+
+
+# Compare une séquence de pistes aux détections de référence
+def run_tracker(frames, reference, every, detect):
+    tracker = BoxTracker(every=every)
+    matched_iou, hits, predicted, expected = [], 0, 0, 0
+    id_of = {}  # Boîte de référence (index) -> identifiant de piste vu précédemment
+    switches = 0
+    start = time.perf_counter()
+    for index, image in enumerate(frames):
+        if tracker.needs_detection():
+            tracker.update(image, *detect(index, image))
+        else:
+            tracker.update(image)
+        tracks = tracker.snapshot()
+        ref_boxes = reference[index][0]
+        expected += len(ref_boxes)
+        predicted += len(tracks)
+        if not len(ref_boxes) or not tracks:
+            continue
+        iou = box_iou(ref_boxes, [box for _, box, _, _, _ in tracks])
+        best = iou.argmax(axis=1)
+        for ref, track in enumerate(best):
+            if iou[ref, track] >= 0.5:
+                hits += 1
+                matched_iou.append(iou[ref, track])
+                track_id = tracks[track][0]
+                if id_of.get(ref, track_id) != track_id:
+                    switches += 1
+                id_of[ref] = track_id
+    elapsed = (time.perf_counter() - start) / len(frames)
+    return {
+        "every": every,
+        "yolo_share": tracker.detections / len(frames),
+        "mean_iou": float(np.mean(matched_iou)) if matched_iou else 0.0,
+        "recall": hits / expected if expected else 1.0,
+        "precision": hits / predicted if predicted else 1.0,
+        "id_switches": switches,
+        "ms_per_frame": elapsed * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dérive du suivi face à la détection complète')
+    parser.add_argument('--video', type=str, default=None, help='Vidéo (sinon scène synthétique)')
+    parser.add_argument('--model', type=str, default=None, help='Poids YOLO (ex. try.pt)')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--every', type=int, nargs='+', default=[1, 2, 3, 5, 10])
+    parser.add_argument('--latency', type=float, default=0.1,
+                        help='Coût simulé d\'un appel au détecteur synthétique (s)')
+    parser.add_argument('--output', type=str, default=None, help='Résultats JSON')
+    args = parser.parse_args()
+
+    if args.video:
+        capture = cv2.VideoCapture(args.video)
+        frames = []
+        while len(frames) < args.frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(frame)
+        capture.release()
+        truth = None
+    else:
+        scene = SyntheticScene()
+        frames, truth = zip(*(scene.frame(index) for index in range(args.frames)))
+
+    if args.model:
+        from ultralytics import YOLO
+
+        model = YOLO(args.model)
+
+        def detect(index, image):
+            return detections_from(model.predict(source=image, conf=args.conf, verbose=False)[0])
+    else:
+        if truth is None:
+            parser.error("--model est obligatoire avec --video")
+
+        def detect(index, image):
+            # Détecteur parfait au coût d'une inférence YOLO sur CPU
+            time.sleep(args.latency)
+            return truth[index]
+
+    reference, reference_cost = reference_detections(frames, detect)
+    print(f"{len(frames)} frames, détection complète : {reference_cost * 1000:.1f} ms/frame")
+    print(f"{'N':>3} {'YOLO':>6} {'IoU':>6} {'rappel':>7} {'précision':>9} {'id':>4} {'ms/frame':>9}")
+    results = []
+    for every in args.every:
+        result = run_tracker(frames, reference, every, detect)
+        results.append(result)
+        print(f"{every:>3} {result['yolo_share']:>6.0%} {result['mean_iou']:>6.3f} "
+              f"{result['recall']:>7.1%} {result['precision']:>9.1%} {result['id_switches']:>4} "
+              f"{result['ms_per_frame']:>9.1f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"reference_ms_per_frame": reference_cost * 1000, "results": results},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+# benchmark.py - banc d'essai de bout en bout des serveurs Pi et du client PC
+# Caméra synthétique (fake_camera.py) et détecteur factice (stub_detector.py) :
+# aucun besoin de picamera2 ni de try.pt. Exemple :
+#   python benchmark.py --variants final1 async --viewers 1 10 50 --client --output bench.json
+import argparse
+import asyncio
+import json
+import os
+import platform
+import runpy
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from fake_camera import pixel_stamp_age, read_pixel_stamp, read_stamp
+from mjpeg_parser import MJPEGParser
+
+# Script et route du flux de chaque variante de serveur (toutes écoutent sur 5000)
+VARIANTS = {
+    'final1': ('Final1.py', '/video_feed'),
+    'optimize': ('optimize.py', '/video_feed'),
+    'app_rasp': (os.path.join('Raspberry connexion', 'app_rasp.py'), '/video_feed'),
+    'rasp_shit': ('Rasp_shit', '/video'),
+    'async': ('async_server.py', '/video_feed'),
+}
+PORT = 5000
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+
+# Centile en millisecondes d'une liste de durées en secondes
+def percentile_ms(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] * 1000
+
+
+# Temps CPU (s) et mémoire résidente (Mo) d'un processus, via /proc
+def process_usage(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    rss = 0.0
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss = int(line.split()[1]) / 1024
+    return cpu, rss
+
+
+def wait_for_port(port, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            asyncio.run(asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), 1))
+            return True
+        except (OSError, asyncio.TimeoutError):
+            time.sleep(0.2)
+    return False
+
+
+# --- Côté serveur : lance une variante telle quelle avec la caméra synthétique ---
+
+def serve(name, stats_file):
+    from fake_camera import FakePicamera2, install_fake_picamera2
+
+    install_fake_picamera2()
+    script = os.path.join(ROOT, VARIANTS[name][0])
+    sys.path.insert(0, os.path.dirname(script))
+
+    # À l'arrêt : octets copiés par frame dans la sortie de l'encodeur, si elle les compte
+    def dump_stats(signum, frame):
+        copied, frames = 0, 0
+        for camera in FakePicamera2.instances:
+            output = getattr(camera.recorder, 'output', None)
+            if output is not None and hasattr(output, 'bytes_copied'):
+                copied += output.bytes_copied
+                frames += output.frames
+        with open(stats_file, 'w') as f:
+            json.dump({'bytes_copied_per_frame': copied / frames if frames else None}, f)
+        os._exit(0)
+
+    signal.signal(signal.SIGTERM, dump_stats)
+    sys.argv = [script]
+    runpy.run_path(script, run_name='__main__')
+
+
+# --- Côté clients : N lecteurs MJPEG simulés dans une boucle asyncio ---
+
+class ViewerStats:
+    def __init__(self):
+        self.frames = 0
+        self.latencies = []
+
+
+async def viewer(path, duration, measure_latency, stats):
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', PORT)
+    except OSError:
+        return
+    writer.write(b'GET %s HTTP/1.1\r\nHost: localhost\r\n\r\n' % path.encode())
+    parser = MJPEGParser(mode='all')
+    end = time.perf_counter() + duration
+    cv2 = None
+    if measure_latency:
+        try:
+            import cv2
+            import numpy as np
+        except ImportError:
+            cv2 = None
+    try:
+        while True:
+            remaining = end - time.perf_counter()
+            if remaining <= 0:
+                break
+            chunk = await asyncio.wait_for(reader.read(256 * 1024), remaining)
+            if not chunk:
+                break
+            now = time.time()
+            for jpeg in parser.feed(chunk):
+                stats.frames += 1
+                if not measure_latency:
+                    continue
+                seq, captured = read_stamp(jpeg)
+                if captured is not None:
+                    stats.latencies.append(now - captured)
+                elif cv2 is not None:
+                    # Variantes capture_array : horodatage inscrit dans les pixels
+                    gray = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8),
+                                        cv2.IMREAD_REDUCED_GRAYSCALE_8)
+                    if gray is not None:
+                        stats.latencies.append(pixel_stamp_age(read_pixel_stamp(gray, 8), now))
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    writer.close()
+
+
+async def run_viewers(path, viewers, duration, latency_clients):
+    stats = [ViewerStats() for _ in range(viewers)]
+    await asyncio.gather(*(viewer(path, duration, i < latency_clients, stats[i])
+                           for i in range(viewers)))
+    return stats
+
+
+def bench_server(name, args):
+    script, path = VARIANTS[name]
+    stats_file = os.path.join(args.workdir, f'{name}.stats.json')
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', name,
+                             '--stats-file', stats_file],
+                            cwd=args.workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    results = []
+    try:
+        if not wait_for_port(PORT):
+            print(f"{name}: le serveur n'a pas démarré")
+            return results
+        time.sleep(args.warmup)
+        for viewers in args.viewers:
+            cpu0, rss0 = process_usage(proc.pid)
+            start = time.perf_counter()
+            stats = asyncio.run(run_viewers(path, viewers, args.duration, args.latency_clients))
+            elapsed = time.perf_counter() - start
+            cpu1, rss1 = process_usage(proc.pid)
+            rates = [s.frames / args.duration for s in stats]
+            latencies = [l for s in stats for l in s.latencies]
+            cpu = (cpu1 - cpu0) / elapsed * 100
+            result = {
+                'variant': name,
+                'viewers': viewers,
+                'fps_mean': sum(rates) / len(rates),
+                'fps_min': min(rates),
+                'latency_p50_ms': percentile_ms(latencies, 50),
+                'latency_p99_ms': percentile_ms(latencies, 99),
+                'server_cpu_percent': cpu,
+                'cpu_per_client_percent': cpu / viewers,
+                'rss_start_mb': rss0,
+                'rss_growth_mb': rss1 - rss0,
+            }
+            results.append(result)
+            print_result(result)
+    finally:
+        proc.terminate()
+        proc.wait()
+    # Octets copiés par frame relevés par le serveur à l'arrêt
+    if os.path.exists(stats_file):
+        with open(stats_file) as f:
+            copied = json.load(f).get('bytes_copied_per_frame')
+        os.remove(stats_file)
+        for result in results:
+            result['bytes_copied_per_frame'] = copied
+    return results
+
+
+# --- Client PC : chemin de réception de app_pc.py avec le détecteur factice ---
+
+def run_client(url, args):
+    from stub_detector import install_fake_ultralytics
+
+    install_fake_ultralytics(args.detector_latency, args.detector_per_image)
+    camera = url.split('//', 1)[1].split('/', 1)[0]
+    sys.argv = ['app_pc.py', '--cameras', camera]
+    app_pc = runpy.run_path(os.path.join(ROOT, 'Raspberry connexion', 'app_pc.py'),
+                            run_name='app_pc_benchmark')
+    pipeline = app_pc['DetectionPipeline']()
+    latencies = []
+
+    # Latence capture (horodatage de la caméra) -> fin de l'annotation
+    def collect():
+        seq = 0
+        sink = pipeline.annotators[0].sink
+        while not sink.closed:
+            seq, packet = sink.wait_next(seq, timeout=0.5)
+            if packet is not None:
+                captured = read_stamp(packet.jpeg)[1]
+                if captured is not None:
+                    latencies.append(time.time() - captured)
+
+    threading.Thread(target=collect, daemon=True).start()
+    time.sleep(args.warmup)
+    cpu0, rss0 = process_usage(os.getpid())
+    done0 = pipeline.batcher.processed[0]
+    received0 = pipeline.clients[0].parser.frames
+    del latencies[:]
+    time.sleep(args.duration)
+    cpu1, rss1 = process_usage(os.getpid())
+    result = {
+        'variant': 'app_pc',
+        'viewers': 1,
+        'received_fps': (pipeline.clients[0].parser.frames - received0) / args.duration,
+        'analysed_fps': (pipeline.batcher.processed[0] - done0) / args.duration,
+        'latency_p50_ms': percentile_ms(latencies, 50),
+        'latency_p99_ms': percentile_ms(latencies, 99),
+        'client_cpu_percent': (cpu1 - cpu0) / args.duration * 100,
+        'rss_start_mb': rss0,
+        'rss_growth_mb': rss1 - rss0,
+        'detector_latency_ms': args.detector_latency * 1000,
+    }
+    pipeline.stop()
+    with open(args.stats_file, 'w') as f:
+        json.dump(result, f)
+
+
+def bench_client(args):
+    name = args.client_server
+    stats_file = os.path.join(args.workdir, 'app_pc.stats.json')
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', name,
+                               '--stats-file', os.devnull],
+                              cwd=args.workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for_port(PORT):
+            print(f"{name}: le serveur n'a pas démarré")
+            return []
+        url = f'http://127.0.0.1:{PORT}{VARIANTS[name][1]}'
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--run-client', url,
+                        '--stats-file', stats_file, '--duration', str(args.duration),
+                        '--warmup', str(args.warmup),
+                        '--detector-latency', str(args.detector_latency),
+                        '--detector-per-image', str(args.detector_per_image)],
+                       cwd=args.workdir, stdout=subprocess.DEVNULL, check=False)
+    finally:
+        server.terminate()
+        server.wait()
+    if not os.path.exists(stats_file):
+        print("app_pc: aucun résultat")
+        return []
+    with open(stats_file) as f:
+        result = json.load(f)
+    os.remove(stats_file)
+    result['server'] = name
+    print_result(result)
+    return [result]
+
+
+def print_result(result):
+    fields = ', '.join(f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}"
+                       for key, value in result.items() if key != 'variant')
+    print(f"{result['variant']:<10} {fields}")
+
+
+# Compare aux résultats d'un run précédent (suivi des régressions)
+def compare(results, baseline_file, tolerance):
+    with open(baseline_file) as f:
+        baseline = {(r['variant'], r['viewers']): r for r in json.load(f)['results']}
+    regressions = 0
+    for result in results:
+        old = baseline.get((result['variant'], result['viewers']))
+        if old is None:
+            continue
+        for key, higher_is_better in (('fps_mean', True), ('analysed_fps', True),
+                                      ('latency_p99_ms', False), ('cpu_per_client_percent', False)):
+            new_value, old_value = result.get(key), old.get(key)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            if (change < -tolerance) if higher_is_better else (change > tolerance):
+                regressions += 1
+                print(f"RÉGRESSION {result['variant']} clients={result['viewers']} {key}: "
+                      f"{old_value:.1f} -> {new_value:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Banc d\'essai des serveurs et du client')
+    parser.add_argument('--variants', nargs='+', choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument('--viewers', type=int, nargs='+', default=[1, 5, 10])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--latency-clients', type=int, default=4,
+                        help='Nombre de clients qui mesurent la latence')
+    parser.add_argument('--client', action='store_true',
+                        help='Mesurer aussi le chemin de réception de app_pc.py')
+    parser.add_argument('--client-server', choices=list(VARIANTS), default='final1')
+    parser.add_argument('--detector-latency', type=float, default=0.05,
+                        help='Latence du détecteur factice par appel (s)')
+    parser.add_argument('--detector-per-image', type=float, default=0.0,
+                        help='Latence supplémentaire par image du lot (s)')
+    parser.add_argument('--output', type=str, default=None, help='Résultats JSON')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='Résultats JSON de référence à comparer')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    parser.add_argument('--workdir', type=str, default=ROOT)
+    parser.add_argument('--serve', choices=list(VARIANTS), help=argparse.SUPPRESS)
+    parser.add_argument('--run-client', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--stats-file', type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.stats_file)
+        return
+    if args.run_client:
+        run_client(args.run_client, args)
+        return
+
+    results = []
+    for name in args.variants:
+        results += bench_server(name, args)
+    if args.client:
+        results += bench_client(args)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+        'config': {'viewers': args.viewers, 'duration': args.duration,
+                   'detector_latency': args.detector_latency},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline and compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+# camera_sources.py - sources vidéo interchangeables pour les serveurs
+# Toutes les sources écrivent des JPEG complets dans une sortie (StreamingOutput).
+# Les modules lourds (picamera2, cv2) ne sont importés qu'au démarrage de la
+# source, et start_in_background() laisse le serveur HTTP répondre pendant que
+# la caméra chauffe.
+import threading
+import time
+
+
+class CameraSource:
+    def __init__(self, width=640, height=480, fps=15, quality=80):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.quality = quality
+        self.scale = 1.0  # Réduction de résolution appliquée avant l'encodage
+        self.encode_time = 0.0  # Durée moyenne d'encodage d'une frame (s), 0 si inconnue
+        self.ready = threading.Event()
+        self.error = None
+
+    def start(self, output):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+    # Change qualité, fps et résolution sans redémarrer la caméra
+    def adjust(self, quality=None, fps=None, scale=None):
+        if quality is not None:
+            self.quality = quality
+        if fps is not None:
+            self.fps = fps
+        if scale is not None:
+            self.scale = scale
+
+    # Taille encodée pour l'échelle courante (dimensions paires)
+    def scaled_size(self):
+        return (max(16, round(self.width * self.scale) // 2 * 2),
+                max(16, round(self.height * self.scale) // 2 * 2))
+
+    def note_encode(self, seconds):
+        self.encode_time += 0.1 * (seconds - self.encode_time)
+
+    # Démarre la source dans un thread ; les erreurs sont gardées dans self.error
+    def start_in_background(self, output):
+        def run():
+            try:
+                self.start(output)
+            except Exception as e:
+                self.error = e
+                print(f"Erreur de démarrage de la caméra: {e}")
+            else:
+                self.ready.set()
+
+        threading.Thread(target=run, name="camera-start", daemon=True).start()
+        return self
+
+
+# Caméra de la Raspberry Pi, encodeur JPEG de picamera2
+class Picamera2Source(CameraSource):
+    def start(self, output):
+        from picamera2 import Picamera2
+        from picamera2.outputs import FileOutput
+
+        self.camera = Picamera2()
+        camera_config = self.camera.create_video_configuration(
+            main={"size": (self.width, self.height), "format": "RGB888"},
+            controls={"FrameRate": self.fps},
+            buffer_count=4
+        )
+        self.camera.configure(camera_config)
+        self.encoder = make_jpeg_encoder(self)
+        self.camera.start_recording(self.encoder, FileOutput(output))
+
+    # La qualité est relue par l'encodeur à chaque frame, le fps est un
+    # contrôle du capteur : rien n'est reconfiguré
+    def adjust(self, quality=None, fps=None, scale=None):
+        super().adjust(quality, fps, scale)
+        if quality is not None:
+            self.encoder.q = quality
+        if fps is not None:
+            self.camera.set_controls({"FrameRate": fps})
+
+    def stop(self):
+        self.camera.stop_recording()
+
+
+# Encodeur JPEG de picamera2 qui mesure sa durée et réduit l'image avant
+# l'encodage quand source.scale < 1
+def make_jpeg_encoder(source):
+    from picamera2.encoders import JpegEncoder
+
+    class AdaptiveJpegEncoder(JpegEncoder):
+        def encode_func(self, request, name):
+            start = time.perf_counter()
+            if source.scale >= 1:
+                result = super().encode_func(request, name)
+            else:
+                import cv2
+                import simplejpeg
+                from picamera2 import MappedArray
+
+                with MappedArray(request, name) as m:
+                    image = cv2.resize(m.array, source.scaled_size(), interpolation=cv2.INTER_AREA)
+                result = simplejpeg.encode_jpeg(image, quality=self.q, colorspace=self.colour_space,
+                                                colorsubsampling=self.colour_subsampling)
+            source.note_encode(time.perf_counter() - start)
+            return result
+
+    return AdaptiveJpegEncoder(q=source.quality)
+
+
+# Lecture via OpenCV (périphérique V4L2 ou fichier vidéo) et encodage JPEG
+class OpenCVSource(CameraSource):
+    def __init__(self, device, loop=False, **kwargs):
+        super().__init__(**kwargs)
+        self.device = device
+        self.loop = loop  # Rejouer le fichier en boucle
+        self.stopped = False
+        self.thread = None
+
+    def open(self):
+        import cv2
+
+        capture = cv2.VideoCapture(self.device)
+        if not capture.isOpened():
+            raise RuntimeError(f"Impossible d'ouvrir {self.device}")
+        if isinstance(self.device, int):
+            capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            capture.set(cv2.CAP_PROP_FPS, self.fps)
+        return capture
+
+    def start(self, output):
+        capture = self.open()
+        self.thread = threading.Thread(target=self.run, args=(capture, output),
+                                       name="camera-opencv", daemon=True)
+        self.thread.start()
+
+    def run(self, capture, output):
+        import cv2
+
+        deadline = time.perf_counter()
+        while not self.stopped:
+            ok, frame = capture.read()
+            if not ok:
+                if not self.loop:
+                    break
+                capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                continue
+            if not self.loop:
+                # Périphérique plus rapide que le fps demandé : frames en trop ignorées
+                now = time.perf_counter()
+                if now < deadline - 0.2 / self.fps:
+                    continue
+                deadline = max(deadline + 1 / self.fps, now - 1 / self.fps)
+            # Qualité, fps et échelle relus à chaque frame (réglage adaptatif)
+            start = time.perf_counter()
+            size = self.scaled_size()
+            if frame.shape[1::-1] != size:
+                frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            self.note_encode(time.perf_counter() - start)
+            output.write(buffer.tobytes())
+            if self.loop:
+                # Un fichier se lit plus vite que le temps réel : on cadence
+                deadline += 1 / self.fps
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    deadline = time.perf_counter()
+        capture.release()
+
+    def stop(self):
+        self.stopped = True
+        if self.thread is not None:
+            self.thread.join()
+
+
+# Générateur synthétique (machines sans caméra, bancs d'essai)
+class SyntheticSource(CameraSource):
+    def start(self, output):
+        from fake_camera import FakeCamera
+
+        self.camera = FakeCamera(output, self.width, self.height, self.fps, quality=self.quality)
+        self.camera.start()
+
+    def adjust(self, quality=None, fps=None, scale=None):
+        old = (self.quality, self.scale)
+        super().adjust(quality, fps, scale)
+        self.camera.fps = self.fps
+        if (self.quality, self.scale) != old:
+            self.camera.configure(*self.scaled_size(), self.quality)
+
+    def stop(self):
+        self.camera.stop()
+
+
+# Construit une source à partir de sa description :
+#   picamera2 | synthetic | v4l2:0 | /dev/video0 | file:chemin.mp4
+def open_source(spec, width=640, height=480, fps=15, quality=80):
+    options = dict(width=width, height=height, fps=fps, quality=quality)
+    if spec == 'picamera2':
+        return Picamera2Source(**options)
+    if spec == 'synthetic':
+        return SyntheticSource(**options)
+    if spec.startswith('v4l2:'):
+        device = spec[5:]
+        return OpenCVSource(int(device) if device.isdigit() else device, **options)
+    if spec.startswith('/dev/video'):
+        return OpenCVSource(spec, **options)
+    if spec.startswith('file:'):
+        return OpenCVSource(spec[5:], loop=True, **options)
+    raise ValueError(f"Source vidéo inconnue: {spec}")
@@ -0,0 +1,148 @@
+# capture_service.py - photos prises sur une caméra qui reste allumée
+# La caméra démarre une seule fois ; chaque photo est une frame du flux en
+# cours, lue par un seul thread caméra. Les demandes simultanées sont
+# regroupées sur la même frame et l'écriture des fichiers (photo + vignette)
+# se fait sur un groupe de threads, hors du chemin de la requête.
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+THUMB_WIDTH = 320
+
+
+class Shot:
+    def __init__(self, count=1, interval=0.0):
+        self.count = count
+        self.interval = interval
+        self.filenames = []
+        self.error = None
+        self.grabbed = threading.Event()  # Toutes les frames sont prises
+
+
+def photo_filename(now):
+    # Millisecondes dans le nom : plusieurs photos par seconde en rafale
+    return now.strftime("%Y%m%d_%H%M%S_") + f"{now.microsecond // 1000:03d}.jpg"
+
+
+class CaptureService:
+    def __init__(self, camera, directory, quality=90, workers=2, max_pending=8,
+                 on_saved=None):
+        self.camera = camera
+        self.directory = directory
+        self.thumb_directory = os.path.join(directory, "thumbs")
+        self.quality = quality
+        self.on_saved = on_saved  # Rappel (nom, largeur, hauteur) une fois la photo écrite
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = None  # Photo simple en attente, partagée par les requêtes
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="photo-writer")
+        # Borne les images en mémoire quand l'écriture ne suit pas la rafale
+        self.slots = threading.Semaphore(max_pending)
+        self.writes = {}  # Nom de fichier -> Future de l'écriture
+        self.stopped = False
+        self.thread = None
+
+    def start(self):
+        os.makedirs(self.thumb_directory, exist_ok=True)
+        self.camera.start()
+        self.thread = threading.Thread(target=self.run, name="camera", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped = True
+        self.requests.put(None)
+        self.thread.join()
+        self.pool.shutdown(wait=True)
+        self.camera.stop()
+
+    # Une photo : rejoint la demande en attente s'il y en a une
+    def capture(self, timeout=5.0):
+        with self.lock:
+            shot = self.pending
+            if shot is None:
+                shot = self.pending = Shot()
+                self.requests.put(shot)
+        return self.wait(shot, timeout)
+
+    # Rafale de count frames espacées d'interval secondes (0 : cadence du capteur)
+    def burst(self, count, interval=0.0, timeout=None):
+        shot = Shot(count, interval)
+        self.requests.put(shot)
+        if timeout is None:
+            timeout = 5.0 + count * max(interval, 0.1)
+        return self.wait(shot, timeout)
+
+    def wait(self, shot, timeout):
+        if not shot.grabbed.wait(timeout):
+            raise TimeoutError("La caméra ne répond pas")
+        if shot.error is not None:
+            raise shot.error
+        return list(shot.filenames)
+
+    # Attend que le fichier soit sur disque (avant de l'afficher)
+    def flush(self, filename, timeout=5.0):
+        future = self.writes.get(filename)
+        if future is not None:
+            future.result(timeout)
+
+    def run(self):
+        while not self.stopped:
+            shot = self.requests.get()
+            if shot is None:
+                return
+            with self.lock:
+                if self.pending is shot:
+                    # Les requêtes suivantes auront la frame d'après
+                    self.pending = None
+            try:
+                self.take(shot)
+            except Exception as e:
+                shot.error = e
+            shot.grabbed.set()
+
+    def take(self, shot):
+        deadline = time.perf_counter()
+        for index in range(shot.count):
+            if index and shot.interval > 0:
+                deadline += shot.interval
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.slots.acquire()
+            try:
+                image = self.camera.capture_array()
+            except Exception:
+                self.slots.release()
+                raise
+            filename = photo_filename(datetime.now())
+            with self.lock:
+                future = self.pool.submit(self.save, filename, image)
+                self.writes[filename] = future
+            future.add_done_callback(lambda f, name=filename: self.done(name))
+            shot.filenames.append(filename)
+
+    def done(self, filename):
+        with self.lock:
+            self.writes.pop(filename, None)
+        self.slots.release()
+
+    def save(self, filename, image):
+        import cv2
+
+        path = os.path.join(self.directory, filename)
+        # Écriture dans un fichier caché puis renommage : jamais de photo à moitié écrite
+        temporary = os.path.join(self.directory, ".tmp_" + filename)
+        cv2.imwrite(temporary, image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        os.replace(temporary, path)
+        height, width = image.shape[:2]
+        thumb_height = max(1, height * THUMB_WIDTH // width)
+        thumb = cv2.resize(image, (THUMB_WIDTH, thumb_height), interpolation=cv2.INTER_AREA)
+        cv2.imwrite(os.path.join(self.thumb_directory, filename), thumb,
+                    [cv2.IMWRITE_JPEG_QUALITY, 80])
+        if self.on_saved is not None:
+            self.on_saved(filename, width, height)
+        return path
@@ -0,0 +1,168 @@
+# clip_recorder.py - clips vidéo avant/après une détection
+# Un anneau en mémoire garde les JPEG déjà produits par l'encodeur (aucun
+# ré-encodage). Au déclenchement, la pré-capture et la post-capture sont
+# écrites en MJPEG/AVI indexé par un thread d'écriture : la capture et le
+# streaming n'attendent jamais la carte SD.
+import collections
+import datetime
+import os
+import queue
+import struct
+import threading
+import time
+
+from frame_transport import jpeg_size
+
+AVIF_HASINDEX = 0x10
+AVIIF_KEYFRAME = 0x10
+
+
+def chunk(fourcc, data):
+    pad = b'\x00' if len(data) % 2 else b''
+    return fourcc + struct.pack('<I', len(data)) + data + pad
+
+
+def list_chunk(kind, data):
+    return b'LIST' + struct.pack('<I', len(data) + 4) + kind + data
+
+
+# Écrit une liste de JPEG dans un fichier AVI MJPEG avec index idx1
+def write_avi(path, frames, width, height, fps):
+    largest = max(len(frame) for frame in frames)
+    avih = struct.pack('<14I', int(1e6 / fps), int(largest * fps), 0, AVIF_HASINDEX,
+                       len(frames), 0, 1, largest, width, height, 0, 0, 0, 0)
+    strh = (b'vidsMJPG' +
+            struct.pack('<IHHIIIIIIiI4h', 0, 0, 0, 0, 1000, int(fps * 1000), 0,
+                        len(frames), largest, -1, 0, 0, 0, width, height))
+    strf = struct.pack('<IiiHH4sIiiII', 40, width, height, 1, 24, b'MJPG',
+                       width * height * 3, 0, 0, 0, 0)
+    hdrl = list_chunk(b'hdrl', chunk(b'avih', avih) +
+                      list_chunk(b'strl', chunk(b'strh', strh) + chunk(b'strf', strf)))
+
+    # Index : position de chaque frame relative au fourcc 'movi'
+    index = bytearray()
+    offset = 4
+    for frame in frames:
+        index += b'00dc' + struct.pack('<III', AVIIF_KEYFRAME, offset, len(frame))
+        offset += 8 + len(frame) + len(frame) % 2
+    movi_size = offset
+    riff_size = 4 + len(hdrl) + 8 + movi_size + 8 + len(index)
+
+    with open(path, 'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I', riff_size) + b'AVI ')
+        f.write(hdrl)
+        f.write(b'LIST' + struct.pack('<I', movi_size) + b'movi')
+        for frame in frames:
+            f.write(b'00dc' + struct.pack('<I', len(frame)))
+            f.write(frame)
+            if len(frame) % 2:
+                f.write(b'\x00')
+        f.write(chunk(b'idx1', bytes(index)))
+
+
+class Clip:
+    def __init__(self, frames, until, limit):
+        self.frames = frames  # [(horodatage, jpeg)]
+        self.until = until    # Fin de la post-capture
+        self.limit = limit    # Durée maximale du clip, même si les alertes continuent
+        self.started = time.time()
+
+
+class ClipRecorder:
+    # Mémoire bornée : au plus pre_seconds * fps frames et max_bytes octets dans
+    # l'anneau, et au plus max_pending clips en attente d'écriture
+    def __init__(self, hub, directory="clips", pre_seconds=5.0, post_seconds=5.0,
+                 fps=15, max_bytes=32 * 1024 * 1024, max_clip_seconds=60.0,
+                 max_pending=2, width=640, height=480):
+        self.hub = hub
+        self.directory = directory
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps
+        self.max_bytes = max_bytes
+        self.max_clip_seconds = max_clip_seconds
+        self.width = width
+        self.height = height
+        self.ring = collections.deque()
+        self.ring_bytes = 0
+        self.ring_frames = max(1, int(pre_seconds * fps))
+        self.clip = None
+        self.lock = threading.Lock()
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.written = []
+        self.dropped = 0
+        self.thread = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.hub.add_listener(self.on_frame)
+        self.thread = threading.Thread(target=self.run, name="clip-writer", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.hub.remove_listener(self.on_frame)
+        with self.lock:
+            clip, self.clip = self.clip, None
+        if clip is not None:
+            self.pending.put(clip)
+        self.pending.put(None)
+        self.thread.join()
+
+    # Abonné au hub, appelé dans le thread de l'encodeur : simple ajout en mémoire
+    def on_frame(self, seq, frame):
+        now = time.time()
+        with self.lock:
+            self.ring.append((now, frame))
+            self.ring_bytes += len(frame)
+            while len(self.ring) > self.ring_frames or self.ring_bytes > self.max_bytes:
+                self.ring_bytes -= len(self.ring.popleft()[1])
+            clip = self.clip
+            if clip is None:
+                return
+            clip.frames.append((now, frame))
+            if now < clip.until and now - clip.started < clip.limit:
+                return
+            self.clip = None
+        self.submit(clip)
+
+    # Démarre un clip (ou prolonge la post-capture du clip en cours)
+    def trigger(self):
+        now = time.time()
+        with self.lock:
+            if self.clip is not None:
+                self.clip.until = now + self.post_seconds
+                return
+            self.clip = Clip(list(self.ring), now + self.post_seconds, self.max_clip_seconds)
+
+    def submit(self, clip):
+        try:
+            self.pending.put_nowait(clip)
+        except queue.Full:
+            # La carte SD ne suit pas : on abandonne le clip plutôt que la mémoire
+            self.dropped += 1
+            print("Clip abandonné: écriture en retard")
+
+    def run(self):
+        while True:
+            clip = self.pending.get()
+            if clip is None:
+                return
+            try:
+                self.written.append(self.write(clip))
+            except OSError as e:
+                print(f"Erreur d'écriture du clip: {e}")
+
+    def write(self, clip):
+        frames = [frame for _, frame in clip.frames]
+        if not frames:
+            return None
+        width, height = jpeg_size(frames[0]) or (self.width, self.height)
+        # Cadence réelle du clip, pour une lecture à la bonne vitesse
+        duration = clip.frames[-1][0] - clip.frames[0][0]
+        fps = (len(frames) - 1) / duration if duration > 0 else self.fps
+        name = datetime.datetime.fromtimestamp(clip.started).strftime("clip_%Y%m%d_%H%M%S.avi")
+        path = os.path.join(self.directory, name)
+        write_avi(path, frames, width, height, fps)
+        print(f"Clip enregistré: {path} ({len(frames)} frames)")
+        return path
@@ -1,6 +1,60 @@
-from ultralytics import YOLO
-model=YOLO("try.pt")  # Load a pretrained YOLOv8 model
-model.predict(source="0",  # Use webcam as input source
-              conf=0.6,  # Confidence threshold for predictions
-              show=True,  # Display the output in a window
-)
+import argparse
+import cv2
+from gating import MotionFireGate
+from model_cache import BACKENDS, load_model
+from tracker import BoxTracker, detections_from, draw_tracks
+
+parser = argparse.ArgumentParser(description='Détection d\'incendies sur la webcam')
+parser.add_argument('--gate', action='store_true',
+                    help='Filtrer les frames statiques (mouvement / couleur de feu) avant YOLO')
+parser.add_argument('--heartbeat', type=float, default=5.0,
+                    help='Intervalle max sans inférence complète (s)')
+parser.add_argument('--detect-every', type=int, default=1,
+                    help='YOLO toutes les N frames, boîtes suivies par flux optique entre deux')
+parser.add_argument('--backend', choices=BACKENDS, default='auto',
+                    help='Runtime d\'inférence (auto : OpenVINO ou ONNX Runtime si installé, sinon PyTorch)')
+parser.add_argument('--int8', action='store_true',
+                    help='Modèle exporté quantifié en INT8')
+parser.add_argument('--calibration', type=str, default=None,
+                    help='Jeu de calibration (yaml Ultralytics) pour l\'INT8 OpenVINO')
+parser.add_argument('--imgsz', type=int, default=640,
+                    help='Taille d\'entrée du modèle exporté')
+args = parser.parse_args()
+
+model = load_model("try.pt", backend=args.backend, imgsz=args.imgsz, int8=args.int8,
+                   data=args.calibration)
+if not args.gate and args.detect_every <= 1:
+    model.predict(source="0",  # Use webcam as input source
+                  conf=0.6,  # Confidence threshold for predictions
+                  show=True,  # Display the output in a window
+    )
+else:
+    # YOLO ne tourne que si la scène change ou si une couleur de flamme apparaît,
+    # et seulement toutes les N frames quand le suivi est actif
+    gate = MotionFireGate(heartbeat=args.heartbeat) if args.gate else None
+    tracker = BoxTracker(every=args.detect_every) if args.detect_every > 1 else None
+    capture = cv2.VideoCapture(0)
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        if gate is not None and not gate.check(frame):
+            cv2.imshow('YOLO', frame)
+        elif tracker is None:
+            results = model.predict(source=frame, conf=0.6, verbose=False)
+            cv2.imshow('YOLO', results[0].plot())
+        else:
+            if tracker.needs_detection():
+                results = model.predict(source=frame, conf=0.6, verbose=False)
+                tracker.update(frame, *detections_from(results[0]))
+            else:
+                tracker.update(frame)
+            cv2.imshow('YOLO', draw_tracks(frame, tracker.snapshot(), model.names))
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+    capture.release()
+    cv2.destroyAllWindows()
+    if gate is not None:
+        print(gate.stats())
+    if tracker is not None:
+        print(tracker.stats())
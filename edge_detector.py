@@ -0,0 +1,135 @@
+# edge_detector.py - détection d'incendies directement sur la Raspberry Pi
+# Le modèle est un export ONNX de try.pt, par exemple :
+#   yolo export model=try.pt format=onnx imgsz=320
+# Il tourne sous ONNX Runtime s'il est installé, sinon avec OpenCV DNN.
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class OnnxYolo:
+    def __init__(self, model_path, input_size=320, conf=0.5, iou=0.45, threads=2):
+        self.input_size = input_size
+        self.conf = conf
+        self.iou = iou
+        try:
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = threads
+            self.session = ort.InferenceSession(model_path, options,
+                                                providers=['CPUExecutionProvider'])
+            self.input_name = self.session.get_inputs()[0].name
+            self.net = None
+        except ImportError:
+            self.session = None
+            self.net = cv2.dnn.readNetFromONNX(model_path)
+
+    # Redimensionne en conservant les proportions (bandes grises autour)
+    def letterbox(self, image):
+        h, w = image.shape[:2]
+        scale = self.input_size / max(h, w)
+        nh, nw = int(round(h * scale)), int(round(w * scale))
+        canvas = np.full((self.input_size, self.input_size, 3), 114, dtype=np.uint8)
+        top, left = (self.input_size - nh) // 2, (self.input_size - nw) // 2
+        canvas[top:top + nh, left:left + nw] = cv2.resize(image, (nw, nh),
+                                                          interpolation=cv2.INTER_LINEAR)
+        return canvas, scale, left, top
+
+    # Retourne une liste de (classe, confiance, (x1, y1, x2, y2)) en pixels de l'image
+    def predict(self, image):
+        canvas, scale, left, top = self.letterbox(image)
+        blob = cv2.dnn.blobFromImage(canvas, 1 / 255.0, swapRB=True)
+        if self.session is not None:
+            output = self.session.run(None, {self.input_name: blob})[0]
+        else:
+            self.net.setInput(blob)
+            output = self.net.forward()
+        # Sortie YOLOv8 : (1, 4 + classes, N) -> (N, 4 + classes)
+        predictions = output[0].T
+        scores = predictions[:, 4:]
+        classes = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), classes]
+        keep = confidences >= self.conf
+        if not keep.any():
+            return []
+        boxes = predictions[keep, :4]
+        classes, confidences = classes[keep], confidences[keep]
+        # (cx, cy, w, h) -> (x, y, w, h) dans l'image d'origine
+        xywh = np.empty_like(boxes)
+        xywh[:, 0] = (boxes[:, 0] - boxes[:, 2] / 2 - left) / scale
+        xywh[:, 1] = (boxes[:, 1] - boxes[:, 3] / 2 - top) / scale
+        xywh[:, 2] = boxes[:, 2] / scale
+        xywh[:, 3] = boxes[:, 3] / scale
+        # NMS par classe : boîtes décalées d'une classe à l'autre pour qu'un feu
+        # et une fumée qui se recouvrent ne s'éliminent pas
+        shifted = xywh.copy()
+        shifted[:, :2] += classes[:, None] * (np.abs(xywh).max() * 2 + 1)
+        indices = cv2.dnn.NMSBoxes(shifted.tolist(), confidences.tolist(), self.conf, self.iou)
+        detections = []
+        for i in np.array(indices).flatten():
+            x, y, w, h = xywh[i]
+            detections.append((int(classes[i]), float(confidences[i]),
+                               (float(x), float(y), float(x + w), float(y + h))))
+        return detections
+
+
+class EdgeDetector:
+    # Analyse périodiquement la dernière frame du hub, sans jamais bloquer le
+    # flux vidéo : le JPEG est décodé à résolution réduite dans ce thread.
+    # on_detection(detections) est appelé quand au moins un feu est détecté.
+    def __init__(self, hub, model_path, on_detection, interval=1.0, input_size=320,
+                 conf=0.5, threads=2, reduce=2):
+        self.hub = hub
+        self.model_path = model_path
+        self.on_detection = on_detection
+        self.interval = interval
+        self.input_size = input_size
+        self.conf = conf
+        self.threads = threads
+        # Décodage JPEG direct à 1/2, 1/4 ou 1/8 de la résolution
+        self.reduce = reduce
+        self.read_flag = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                          4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}[reduce]
+        self.model = None
+        self.runs = 0
+        self.last_duration = 0.0
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name="edge-detector", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        # Priorité basse pour laisser le CPU à la capture et au streaming
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except (AttributeError, OSError):
+            pass
+        self.model = OnnxYolo(self.model_path, self.input_size, self.conf, threads=self.threads)
+        seq = 0
+        while not self.stopped:
+            start = time.monotonic()
+            seq, frame = self.hub.wait_next(seq, timeout=self.interval)
+            if frame is not None:
+                image = cv2.imdecode(np.frombuffer(frame, dtype=np.uint8), self.read_flag)
+                if image is not None:
+                    # Boîtes ramenées à la résolution de la frame (décodage réduit)
+                    detections = [(cls, conf, tuple(v * self.reduce for v in box))
+                                  for cls, conf, box in self.model.predict(image)]
+                    self.runs += 1
+                    if detections:
+                        self.on_detection(detections)
+            self.last_duration = time.monotonic() - start
+            # Cadence indépendante du fps de la caméra
+            delay = self.interval - self.last_duration
+            if delay > 0:
+                time.sleep(delay)
+
+    def stop(self):
+        self.stopped = True
+        if self.thread.is_alive():
+            self.thread.join()
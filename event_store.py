@@ -0,0 +1,245 @@
+# event_store.py - journal compact des détections et résumés par minute
+# Chaque boîte détectée devient un enregistrement binaire de 32 octets
+# (heure, caméra, classe, confiance, boîte) ajouté en fin de fichier, un
+# fichier par jour (UTC). Les écritures sont groupées : add() ne fait que
+# remplir un lot en mémoire, vidé par un thread toutes les flush_interval
+# secondes. En parallèle, un résumé par (minute, caméra, classe) de 16 octets
+# (nombre, confiance max) est écrit quand la minute est close : une semaine
+# d'historique pour le tableau de bord se lit en quelques millisecondes sans
+# toucher au journal détaillé.
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+EVENT = np.dtype([('time', '<f8'), ('camera', '<u2'), ('cls', '<u2'), ('conf', '<f4'),
+                  ('box', '<f4', 4)])                                          # 32 octets
+SUMMARY = np.dtype([('minute', '<u4'), ('camera', '<u2'), ('cls', '<u2'), ('count', '<u4'),
+                    ('conf', '<f4')])                                          # 16 octets
+FRAMES = 0xffff  # Classe des lignes de résumé qui comptent les frames avec détection
+DAY = 86400
+MAX_SPAN = 366 * DAY  # Période maximale d'une requête HTTP
+GRACE = 5.0  # Secondes d'attente des détections en retard avant de clore une minute
+
+
+def day_key(timestamp):
+    return time.strftime('%Y%m%d', time.gmtime(timestamp))
+
+
+def days(since, until):
+    day = int(since // DAY) * DAY
+    while day <= until:
+        yield day_key(day)
+        day += DAY
+
+
+class EventStore:
+    # names : noms des classes du modèle (model.names), pour les réponses JSON
+    def __init__(self, directory, names=None, flush_interval=1.0, max_batch=4096):
+        self.directory = directory
+        self.names = dict(names or {})
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        os.makedirs(directory, exist_ok=True)
+        self.cameras_path = os.path.join(directory, 'cameras.json')
+        try:
+            with open(self.cameras_path) as f:
+                self.cameras = json.load(f)
+        except FileNotFoundError:
+            self.cameras = []
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()  # Un seul vidage à la fois
+        self.batch = []    # Enregistrements pas encore écrits
+        self.minutes = {}  # (minute, caméra, classe) -> [nombre, confiance max], minutes ouvertes
+        self.full = threading.Event()
+        self.written = 0
+        self.flushes = 0
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name="event-store", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def path(self, kind, day):
+        return os.path.join(self.directory, f'{kind}-{day}.bin')
+
+    # Numéro de caméra stocké dans les enregistrements (cameras.json garde les noms)
+    def camera_id(self, name):
+        try:
+            return self.cameras.index(name)
+        except ValueError:
+            self.cameras.append(name)
+            with open(self.cameras_path + '.tmp', 'w') as f:
+                json.dump(self.cameras, f)
+            os.replace(self.cameras_path + '.tmp', self.cameras_path)
+            return len(self.cameras) - 1
+
+    # detections : [(classe, confiance, (x1, y1, x2, y2))] d'une même frame
+    def add(self, camera, detections, timestamp=None):
+        if not detections:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        minute = int(timestamp // 60)
+        with self.lock:
+            camera = self.camera_id(camera)
+            for cls, conf, box in detections:
+                cls, conf = int(cls), float(conf)
+                self.batch.append((timestamp, camera, cls, conf, tuple(box)))
+                summary = self.minutes.setdefault((minute, camera, cls), [0, 0.0])
+                summary[0] += 1
+                summary[1] = max(summary[1], conf)
+            frames = self.minutes.setdefault((minute, camera, FRAMES), [0, 0.0])
+            frames[0] += 1
+            frames[1] = max(frames[1], max(float(conf) for _, conf, _ in detections))
+            if len(self.batch) >= self.max_batch:
+                self.full.set()
+
+    def run(self):
+        while not self.stopped:
+            self.full.wait(self.flush_interval)
+            self.full.clear()
+            self.flush()
+
+    # Écrit le lot courant et les minutes closes ; force : toutes les minutes
+    def flush(self, force=False):
+        with self.write_lock:
+            closed = time.time() - GRACE
+            with self.lock:
+                batch, self.batch = self.batch, []
+                done = [key for key in self.minutes if force or (key[0] + 1) * 60 <= closed]
+                minutes = [(*key, *self.minutes.pop(key)) for key in done]
+            if batch:
+                records = np.array(batch, dtype=EVENT)
+                records.sort(order='time')
+                self.append('events', records, records['time'])
+                self.written += len(records)
+            if minutes:
+                # Une minute déjà écrite peut réapparaître (détection en retard) :
+                # les requêtes additionnent les lignes de même clé
+                records = np.array(minutes, dtype=SUMMARY)
+                self.append('summary', records, records['minute'].astype(np.float64) * 60)
+            if batch or minutes:
+                self.flushes += 1
+
+    def append(self, kind, records, times):
+        keys = np.array([day_key(t) for t in times])
+        for day in np.unique(keys):
+            with open(self.path(kind, day), 'ab') as f:
+                f.write(records[keys == day].tobytes())
+
+    def read(self, kind, dtype, since, until):
+        parts = []
+        for day in days(since, until):
+            path = self.path(kind, day)
+            if os.path.exists(path):
+                parts.append(np.fromfile(path, dtype=dtype))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+
+    def class_name(self, cls):
+        return self.names.get(cls, cls)
+
+    def class_id(self, value):
+        for cls, name in self.names.items():
+            if name == value:
+                return cls
+        return int(value)
+
+    # Détections de [since, until], les plus récentes d'abord
+    def events(self, since, until, camera=None, cls=None, limit=1000):
+        records = self.read('events', EVENT, since, until)
+        with self.lock:
+            pending = np.array(self.batch, dtype=EVENT)
+        records = np.concatenate([records, pending])
+        mask = (records['time'] >= since) & (records['time'] <= until)
+        if camera is not None:
+            mask &= records['camera'] == (self.cameras.index(camera) if camera in self.cameras else -1)
+        if cls is not None:
+            mask &= records['cls'] == cls
+        records = records[mask]
+        records = records[np.argsort(-records['time'], kind='stable')[:limit]]
+        return [{"time": float(r['time']), "camera": self.cameras[r['camera']],
+                 "class": self.class_name(int(r['cls'])), "conf": round(float(r['conf']), 3),
+                 "box": [round(float(v), 1) for v in r['box']]}
+                for r in records]
+
+    # Résumé par tranche de step secondes (multiple de 60) : frames avec détection
+    # et, par classe, nombre et confiance max
+    def summary(self, since, until, camera=None, step=60):
+        records = self.read('summary', SUMMARY, since, until)
+        with self.lock:
+            pending = [(*key, *value) for key, value in self.minutes.items()]
+        records = np.concatenate([records, np.array(pending, dtype=SUMMARY)])
+        mask = (records['minute'] >= int(since // 60)) & (records['minute'] <= int(until // 60))
+        if camera is not None:
+            mask &= records['camera'] == (self.cameras.index(camera) if camera in self.cameras else -1)
+        records = records[mask]
+        # Agrégation vectorisée par (tranche, caméra, classe)
+        minutes = max(1, int(step) // 60)
+        keys = ((records['minute'].astype(np.int64) // minutes * minutes) << 32
+                | records['camera'].astype(np.int64) << 16 | records['cls'])
+        keys, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, weights=records['count'], minlength=len(keys))
+        confs = np.zeros(len(keys), np.float32)
+        np.maximum.at(confs, inverse, records['conf'])
+        rows = {}
+        for key, count, conf in zip(keys.tolist(), counts.tolist(), confs.tolist()):
+            minute, cam, cls = key >> 32, key >> 16 & 0xffff, key & 0xffff
+            row = rows.setdefault((minute, cam), {"time": minute * 60, "camera": self.cameras[cam],
+                                                  "frames": 0, "classes": {}})
+            if cls == FRAMES:
+                row["frames"] = int(count)
+            else:
+                row["classes"][self.class_name(cls)] = {"count": int(count),
+                                                        "max_conf": round(conf, 3)}
+        return list(rows.values())
+
+    # Frames avec détection et heure de la dernière, sur tout l'historique
+    def totals(self):
+        frames, last = 0, None
+        for name in sorted(os.listdir(self.directory)):
+            if name.startswith('summary-'):
+                records = np.fromfile(os.path.join(self.directory, name), dtype=SUMMARY)
+                frames += int(records['count'][records['cls'] == FRAMES].sum())
+            elif name.startswith('events-'):
+                path = os.path.join(self.directory, name)
+                if os.path.getsize(path) >= EVENT.itemsize:
+                    with open(path, 'rb') as f:
+                        f.seek(-EVENT.itemsize, os.SEEK_END)
+                        record = np.frombuffer(f.read(EVENT.itemsize), dtype=EVENT)[0]
+                    last = max(last or 0.0, float(record['time']))
+        return frames, last
+
+    # Réponse des routes HTTP ; query : paramètres since, until (secondes
+    # epoch), camera, class, limit, step (résumé). None si un paramètre est invalide
+    def api(self, query, summary=False):
+        now = time.time()
+        try:
+            since = float(query.get('since', now - (7 * DAY if summary else DAY)))
+            until = float(query.get('until', now))
+            limit = min(max(int(query.get('limit', 1000)), 1), 100000)
+            step = min(max(int(query.get('step', 60)), 60), DAY)
+            cls = self.class_id(query['class']) if query.get('class') else None
+            # Bornes finies et période limitée : days() parcourt chaque jour
+            if not (math.isfinite(since) and math.isfinite(until)) or not 0 <= until - since <= MAX_SPAN:
+                raise ValueError("Période invalide")
+        except ValueError:
+            return None
+        camera = query.get('camera') or None
+        if summary:
+            return {"since": since, "until": until, "step": step // 60 * 60,
+                    "summary": self.summary(since, until, camera, step)}
+        return {"since": since, "until": until, "events": self.events(since, until, camera, cls, limit)}
+
+    def stop(self):
+        self.stopped = True
+        self.full.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.flush(force=True)
+
+    def stats(self):
+        return f"historique: {self.written} détections écrites en {self.flushes} lots"
@@ -0,0 +1,243 @@
+# fake_camera.py - caméra synthétique pour les tests de charge sans Raspberry Pi
+# Les frames sont déterministes (graine fixe) et horodatées :
+#  - les JPEG portent un segment COM "GS seq=... t=..." ;
+#  - les tableaux de capture_array() portent l'heure en blocs noir/blanc,
+#    lisibles même après compression JPEG.
+import random
+import re
+import struct
+import sys
+import threading
+import time
+import types
+
+SOI = b'\xff\xd8'
+EOI = b'\xff\xd9'
+
+# Tailles typiques d'un JPEG q=80 produit par la Pi
+JPEG_SIZES = {
+    (640, 480): 45 * 1024,
+    (1280, 720): 140 * 1024,
+    (1920, 1080): 320 * 1024,
+}
+
+STAMP = re.compile(rb'GS seq=(\d+) t=([0-9.]+)')
+STAMP_BITS = 32
+STAMP_BLOCK = 16  # Taille en pixels d'un bit de l'horodatage visuel
+
+
+# Corps d'un pseudo-JPEG : aucun octet 0xff, donc aucun faux marqueur
+def make_body(size, rng=None):
+    rng = rng or random.Random(0)
+    return rng.randbytes(size).replace(b'\xff', b'\xfe')
+
+
+# Segment COM (0xFFFE) portant le numéro et l'heure de capture ; il reste
+# valide dans un vrai JPEG et permet de mesurer la latence côté client
+def make_stamp(seq, timestamp):
+    payload = b'GS seq=%d t=%.6f' % (seq, timestamp)
+    return b'\xff\xfe' + struct.pack('>H', len(payload) + 2) + payload
+
+
+def read_stamp(jpeg):
+    match = STAMP.search(bytes(jpeg[:64]))
+    if match is None:
+        return None, None
+    return int(match.group(1)), float(match.group(2))
+
+
+# Image de test : dégradé fixe et carré qui se déplace d'une frame à l'autre
+def make_image(width, height, index):
+    import numpy as np
+
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[..., 0] = (x * 0.5 + y * 0.5).astype(np.uint8)
+    image[..., 1] = (255 - x).astype(np.uint8)
+    image[..., 2] = y.astype(np.uint8)
+    size = max(8, height // 6)
+    left = (index * 13) % max(1, width - size)
+    top = (index * 7) % max(1, height - size)
+    image[top:top + size, left:left + size] = (0, 128, 255)
+    return image
+
+
+# Corps JPEG (sans SOI ni EOI) : vrais JPEG si OpenCV est disponible, sinon
+# pseudo-JPEG de la taille typique
+def make_bodies(width, height, count, quality=80):
+    try:
+        import cv2
+    except ImportError:
+        rng = random.Random(0)
+        size = JPEG_SIZES.get((width, height), width * height // 7)
+        return [make_body(size, rng) for _ in range(count)]
+    bodies = []
+    for index in range(count):
+        _, buffer = cv2.imencode('.jpg', make_image(width, height, index),
+                                 [cv2.IMWRITE_JPEG_QUALITY, quality])
+        bodies.append(buffer.tobytes()[2:-2])
+    return bodies
+
+
+# Horodatage visuel (millisecondes modulo 2^32) dans la bande du haut de l'image
+def stamp_pixels(image, timestamp):
+    value = int(timestamp * 1000) & 0xffffffff
+    for bit in range(STAMP_BITS):
+        x = bit * STAMP_BLOCK
+        color = 255 if value >> bit & 1 else 0
+        image[:STAMP_BLOCK, x:x + STAMP_BLOCK] = color
+    return image
+
+
+def read_pixel_stamp(gray, scale=1):
+    block = STAMP_BLOCK // scale
+    value = 0
+    for bit in range(STAMP_BITS):
+        center = bit * block + block // 2
+        if gray[block // 2, center] > 127:
+            value |= 1 << bit
+    return value
+
+
+def pixel_stamp_age(value, now=None):
+    now = time.time() if now is None else now
+    return ((int(now * 1000) - value) & 0xffffffff) / 1000
+
+
+class FakeCamera:
+    # Écrit des frames JPEG horodatées dans une sortie (StreamingOutput) à fps fixe
+    def __init__(self, output, width=640, height=480, fps=15, variants=8, quality=80):
+        self.output = output
+        self.fps = fps
+        self.variants = variants
+        # Quelques corps différents pour ne pas renvoyer toujours les mêmes octets
+        self.bodies = make_bodies(width, height, variants, quality)
+        self.seq = 0
+        self.stopped = False
+        self.thread = None
+
+    def next_frame(self):
+        self.seq += 1
+        body = self.bodies[self.seq % len(self.bodies)]
+        return SOI + make_stamp(self.seq, time.time()) + body + EOI
+
+    # Nouvelle taille ou qualité en cours de route (réglage adaptatif)
+    def configure(self, width, height, quality):
+        self.bodies = make_bodies(width, height, self.variants, quality)
+
+    def run(self):
+        deadline = time.perf_counter()
+        while not self.stopped:
+            self.output.write(self.next_frame())
+            # fps relu à chaque frame : il peut changer pendant la capture
+            deadline += 1 / self.fps
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.perf_counter()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped = True
+        if self.thread is not None:
+            self.thread.join()
+
+
+# --- Remplaçant minimal de picamera2 pour faire tourner les serveurs tels quels ---
+
+class FakeJpegEncoder:
+    def __init__(self, q=80, **kwargs):
+        self.q = q
+
+
+class FakeFileOutput:
+    def __init__(self, file=None, **kwargs):
+        self.file = file
+
+
+class FakePicamera2:
+    instances = []  # Pour que le benchmark retrouve les sorties (octets copiés...)
+
+    def __init__(self, *args, **kwargs):
+        self.size = (640, 480)
+        self.fps = 30
+        self.started = False
+        self.recorder = None
+        self.frames = None
+        self.index = 0
+        FakePicamera2.instances.append(self)
+
+    def _configuration(self, main=None, controls=None, **kwargs):
+        return {"main": dict(main or {}), "controls": dict(controls or {})}
+
+    create_video_configuration = _configuration
+    create_preview_configuration = _configuration
+    create_still_configuration = _configuration
+
+    def configure(self, config):
+        self.size = tuple(config["main"].get("size", self.size))
+        self.fps = config["controls"].get("FrameRate", self.fps)
+
+    def start(self):
+        self.started = True
+
+    def stop(self):
+        self.started = False
+        if self.recorder is not None:
+            self.recorder.stop()
+
+    def start_recording(self, encoder, output, **kwargs):
+        width, height = self.size
+        self.recorder = FakeCamera(output.file, width, height, self.fps, quality=encoder.q)
+        self.recorder.start()
+        self.started = True
+
+    def set_controls(self, controls):
+        if "FrameRate" in controls:
+            self.fps = controls["FrameRate"]
+            if self.recorder is not None:
+                self.recorder.fps = self.fps
+
+    def stop_recording(self):
+        self.stop()
+
+    # Bloque jusqu'à la prochaine frame du capteur, comme la vraie caméra
+    def capture_array(self, name="main"):
+        now = time.time()
+        next_frame = (int(now * self.fps) + 1) / self.fps
+        time.sleep(max(0.0, next_frame - now))
+        if self.frames is None:
+            width, height = self.size
+            self.frames = [make_image(width, height, index) for index in range(8)]
+        self.index += 1
+        image = self.frames[self.index % len(self.frames)].copy()
+        return stamp_pixels(image, time.time())
+
+    def capture_file(self, path, **kwargs):
+        import cv2
+        cv2.imwrite(path, self.capture_array())
+
+    def close(self):
+        self.stop()
+
+
+# Installe les modules picamera2, picamera2.encoders et picamera2.outputs factices
+def install_fake_picamera2():
+    package = types.ModuleType("picamera2")
+    package.Picamera2 = FakePicamera2
+    encoders = types.ModuleType("picamera2.encoders")
+    encoders.JpegEncoder = FakeJpegEncoder
+    outputs = types.ModuleType("picamera2.outputs")
+    outputs.FileOutput = FakeFileOutput
+    package.encoders = encoders
+    package.outputs = outputs
+    sys.modules.update({
+        "picamera2": package,
+        "picamera2.encoders": encoders,
+        "picamera2.outputs": outputs,
+    })
@@ -0,0 +1,71 @@
+# frame_hub.py - diffusion des frames JPEG vers les clients du flux vidéo
+import threading
+import time
+
+
+class FrameHub:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.frame = None
+        self.seq = 0  # Numéro de séquence de la dernière frame publiée
+        self.timestamp = 0.0  # Heure de capture de la dernière frame
+        self.closed = False
+        self.listeners = []  # Rappels appelés à chaque publication (ex. boucle asyncio)
+        self.lock_wait = None  # Histogramme optionnel de l'attente du verrou
+
+    # Appelé par l'encodeur à chaque nouvelle frame JPEG complète ;
+    # timestamp : heure de capture (heure de publication par défaut)
+    def publish(self, frame, timestamp=None):
+        if self.lock_wait is not None:
+            start = time.perf_counter()
+            self.condition.acquire()
+            self.lock_wait.observe(time.perf_counter() - start)
+        else:
+            self.condition.acquire()
+        try:
+            self.frame = frame
+            self.timestamp = time.time() if timestamp is None else timestamp
+            self.seq += 1
+            seq = self.seq
+            self.condition.notify_all()
+        finally:
+            self.condition.release()
+        for listener in self.listeners:
+            listener(seq, frame)
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self.listeners.remove(callback)
+
+    # Réveille tous les abonnés pour qu'ils se terminent
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    # Attend une frame plus récente que last_seq et retourne (seq, frame).
+    # Un client en retard saute directement à la frame la plus récente :
+    # aucune file d'attente, chaque frame est envoyée au plus une fois.
+    def wait_next(self, last_seq, timeout=None):
+        seq, frame, _ = self.wait_stamped(last_seq, timeout)
+        return seq, frame
+
+    # Comme wait_next, avec l'heure de capture lue sous le même verrou :
+    # retourne (seq, frame, timestamp)
+    def wait_stamped(self, last_seq, timeout=None):
+        with self.condition:
+            ready = self.condition.wait_for(
+                lambda: self.seq > last_seq or self.closed, timeout)
+            if not ready or self.seq <= last_seq:
+                return last_seq, None, 0.0
+            return self.seq, self.frame, self.timestamp
+
+    # Générateur de frames pour un client ; les frames déjà vues sont ignorées
+    def subscribe(self, timeout=5.0):
+        seq = 0
+        while not self.closed:
+            seq, frame = self.wait_next(seq, timeout)
+            if frame is not None:
+                yield seq, frame
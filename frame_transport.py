@@ -0,0 +1,246 @@
+# frame_transport.py - transport binaire des frames entre la Pi et le PC
+# Chaque message est un en-tête de taille fixe suivi de la charge utile :
+#   magic 'GS', version, format, largeur, hauteur, seq, horodatage, longueur
+# Plus de recherche de marqueurs JPEG ni de découpage HTTP côté PC, et le
+# numéro de séquence rend les pertes visibles.
+# À la connexion, le client envoie une demande (mode, format, largeur) :
+#   - MODE_STREAM : le serveur pousse chaque nouvelle frame ; un client lent
+#     saute directement à la plus récente (FrameHub) ;
+#   - MODE_PULL : le client envoie un octet par frame voulue et reçoit la plus
+#     récente à ce moment-là, sans aucune file d'attente.
+import socket
+import socketserver
+import struct
+import threading
+from collections import OrderedDict, namedtuple
+
+MAGIC = b'GS'
+VERSION = 1
+HEADER = struct.Struct('<2sBBHHQdI')      # 28 octets
+REQUEST = struct.Struct('<2sBBBxH')       # magic, version, mode, format, largeur
+
+FORMAT_JPEG = 0
+FORMAT_GRAY = 1     # 8 bits par pixel
+FORMAT_YUV420 = 2   # I420 : plan Y puis U et V au quart
+FORMATS = {'jpeg': FORMAT_JPEG, 'gray': FORMAT_GRAY, 'yuv420': FORMAT_YUV420}
+
+MODE_STREAM = 0
+MODE_PULL = 1
+PULL = b'N'  # Demande de la frame la plus récente (mode pull)
+
+FrameHeader = namedtuple('FrameHeader', 'seq timestamp format width height')
+
+
+def pack_header(header, length):
+    return HEADER.pack(MAGIC, VERSION, header.format, header.width, header.height,
+                       header.seq, header.timestamp, length)
+
+
+# En-tête et charge utile en un seul appel système, sans concaténation
+def send_frame(sock, header, payload):
+    head = pack_header(header, len(payload))
+    payload = memoryview(payload)
+    sent = sock.sendmsg([head, payload])
+    if sent < len(head):
+        sock.sendall(head[sent:])
+        sent = len(head)
+    sock.sendall(payload[sent - len(head):])
+
+
+def recv_exactly(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            raise ConnectionError("Connexion fermée")
+        received += count
+    return buffer
+
+
+# Lit un message ; retourne (FrameHeader, charge utile)
+def read_frame(sock):
+    magic, version, fmt, width, height, seq, timestamp, length = HEADER.unpack(
+        recv_exactly(sock, HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("En-tête de frame invalide")
+    return FrameHeader(seq, timestamp, fmt, width, height), recv_exactly(sock, length)
+
+
+# Dimensions (largeur, hauteur) lues dans le segment SOF d'un JPEG, None si
+# introuvable ; utilisé aussi par clip_recorder.py et stream_variants.py
+def jpeg_size(jpeg):
+    index = 2
+    while index + 9 < len(jpeg):
+        if jpeg[index] != 0xff:
+            return None
+        marker = jpeg[index + 1]
+        length = (jpeg[index + 2] << 8) | jpeg[index + 3]
+        if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+            height, width = struct.unpack('>HH', jpeg[index + 5:index + 9])
+            return width, height
+        index += 2 + length
+    return None
+
+
+# Conversion d'une charge utile brute en image BGR côté PC
+def to_bgr(header, payload):
+    import cv2
+    import numpy as np
+
+    data = np.frombuffer(payload, dtype=np.uint8)
+    if header.format == FORMAT_JPEG:
+        return cv2.imdecode(data, cv2.IMREAD_COLOR)
+    if header.format == FORMAT_GRAY:
+        return cv2.cvtColor(data.reshape(header.height, header.width), cv2.COLOR_GRAY2BGR)
+    if header.format == FORMAT_YUV420:
+        return cv2.cvtColor(data.reshape(header.height * 3 // 2, header.width),
+                            cv2.COLOR_YUV2BGR_I420)
+    raise ValueError(f"Format inconnu: {header.format}")
+
+
+class RawFrames:
+    # Images brutes tirées des JPEG de l'encodeur, une fois par (seq, format,
+    # largeur) quel que soit le nombre de clients
+    def __init__(self, size=8):
+        self.size = size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, seq, jpeg, fmt, width):
+        key = (seq, fmt, width)
+        with self.lock:
+            frame = self.cache.get(key)
+        if frame is None:
+            frame = self.convert(jpeg, fmt, width)
+            if frame is None:
+                return None
+            with self.lock:
+                self.cache[key] = frame
+                while len(self.cache) > self.size:
+                    self.cache.popitem(last=False)
+        return frame
+
+    @staticmethod
+    def convert(jpeg, fmt, width):
+        import cv2
+        import numpy as np
+
+        data = np.frombuffer(jpeg, dtype=np.uint8)
+        source_width = (jpeg_size(jpeg) or (0, 0))[0]
+        # Décodage directement à résolution réduite quand la largeur le permet
+        reduced = {FORMAT_GRAY: ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+                                 (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                                 (2, cv2.IMREAD_REDUCED_GRAYSCALE_2)),
+                   FORMAT_YUV420: ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                                   (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                   (2, cv2.IMREAD_REDUCED_COLOR_2))}[fmt]
+        flag = cv2.IMREAD_GRAYSCALE if fmt == FORMAT_GRAY else cv2.IMREAD_COLOR
+        for factor, candidate in reduced:
+            if width and source_width // factor >= width:
+                flag = candidate
+                break
+        image = cv2.imdecode(data, flag)
+        if image is None:
+            return None  # JPEG tronqué ou corrompu
+        if width and image.shape[1] != width:
+            height = max(2, round(image.shape[0] * width / image.shape[1]) // 2 * 2)
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        if fmt == FORMAT_YUV420:
+            # I420 demande des dimensions paires
+            image = image[:image.shape[0] // 2 * 2, :image.shape[1] // 2 * 2]
+            height, width = image.shape[:2]
+            return cv2.cvtColor(image, cv2.COLOR_BGR2YUV_I420).tobytes(), width, height
+        height, width = image.shape[:2]
+        return image.tobytes(), width, height
+
+
+class FrameServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    # send_buffer borne les octets en attente dans le noyau : un client lent
+    # en mode stream ne reçoit pas des secondes de frames en retard
+    def __init__(self, hub, host='0.0.0.0', port=5001, send_buffer=128 * 1024):
+        self.hub = hub
+        self.send_buffer = send_buffer
+        self.raw = RawFrames()
+        super().__init__((host, port), FrameHandler)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="frame-transport", daemon=True).start()
+        return self
+
+
+class FrameHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.server.send_buffer)
+        try:
+            magic, version, mode, fmt, width = REQUEST.unpack(recv_exactly(sock, REQUEST.size))
+        except (ConnectionError, struct.error):
+            return
+        if magic != MAGIC or version != VERSION or fmt not in FORMATS.values():
+            return
+        hub = self.server.hub
+        seq = 0
+        requested = False  # Mode pull : demande reçue, pas encore servie
+        try:
+            while not hub.closed:
+                if mode == MODE_PULL and not requested:
+                    if recv_exactly(sock, 1) != PULL:
+                        return
+                    requested = True
+                # Heure de capture publiée avec la frame, sous le verrou du hub
+                seq, jpeg, timestamp = hub.wait_stamped(seq, timeout=5.0)
+                # Frame illisible : la demande reste en attente de la suivante
+                if jpeg is not None and self.send(sock, seq, timestamp, jpeg, fmt, width):
+                    requested = False
+        except (ConnectionError, OSError):
+            pass
+
+    # False si la frame n'a pas pu être convertie (JPEG corrompu) : rien n'est envoyé
+    def send(self, sock, seq, timestamp, jpeg, fmt, width):
+        if fmt == FORMAT_JPEG:
+            frame_width, frame_height = jpeg_size(jpeg) or (0, 0)
+            payload = jpeg
+        else:
+            raw = self.server.raw.get(seq, jpeg, fmt, width)
+            if raw is None:
+                return False
+            payload, frame_width, frame_height = raw
+        send_frame(sock, FrameHeader(seq, timestamp, fmt, frame_width, frame_height), payload)
+        return True
+
+
+class FrameClient:
+    # Connexion au serveur de frames ; frames() produit (FrameHeader, charge utile)
+    def __init__(self, host, port=5001, mode=MODE_STREAM, fmt=FORMAT_JPEG, width=0,
+                 timeout=10.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.settimeout(None)
+        self.mode = mode
+        self.sock.sendall(REQUEST.pack(MAGIC, VERSION, mode, fmt, width))
+        self.last_seq = 0
+        self.received = 0
+        self.skipped = 0  # Frames produites par la Pi mais jamais reçues
+
+    def read(self):
+        if self.mode == MODE_PULL:
+            self.sock.sendall(PULL)
+        header, payload = read_frame(self.sock)
+        if self.last_seq and header.seq > self.last_seq + 1:
+            self.skipped += header.seq - self.last_seq - 1
+        self.last_seq = header.seq
+        self.received += 1
+        return header, payload
+
+    def frames(self):
+        while True:
+            yield self.read()
+
+    def close(self):
+        self.sock.close()
@@ -0,0 +1,72 @@
+# gating.py - filtre peu coûteux avant YOLO : mouvement et couleur de feu
+# La scène forestière est presque toujours statique : on ne lance l'inférence
+# complète que si l'image a changé, si des pixels ont la couleur d'une flamme,
+# ou à intervalle régulier (battement de cœur) par sécurité.
+import time
+
+import cv2
+import numpy as np
+
+
+# Pixels couleur flamme d'une image HSV OpenCV : teintes rouge-orange-jaune
+# (0-35 sur 180, plus les rouges 170-180 de l'autre bout du cercle),
+# saturées et lumineuses. Partagé avec tiling.py
+def fire_mask(hsv):
+    h, s, v = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+    return ((h <= 35) | (h >= 170)) & (s >= 100) & (v >= 150)
+
+
+class MotionFireGate:
+    # scale : pas de sous-échantillonnage (1 pixel sur scale dans chaque axe)
+    # motion_threshold : fraction de pixels ayant changé de plus de pixel_delta
+    # fire_threshold : fraction de pixels de couleur flamme
+    # heartbeat : intervalle max (s) sans inférence complète
+    def __init__(self, scale=8, motion_threshold=0.02, fire_threshold=0.002,
+                 heartbeat=5.0, pixel_delta=25):
+        self.scale = scale
+        self.motion_threshold = motion_threshold
+        self.fire_threshold = fire_threshold
+        self.heartbeat = heartbeat
+        self.pixel_delta = pixel_delta
+        # Image de référence : celle de la dernière inférence complète, pour que
+        # les changements lents (fumée qui monte) s'accumulent jusqu'au seuil
+        self.reference = None
+        self.last_pass = 0.0
+        self.motion = 0.0
+        self.fire = 0.0
+        self.hits = 0        # Inférences déclenchées par un score
+        self.heartbeats = 0  # Inférences déclenchées par le battement de cœur
+        self.misses = 0      # Frames filtrées
+
+    def scores(self, frame):
+        small = np.ascontiguousarray(frame[::self.scale, ::self.scale])
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        if self.reference is None or self.reference.shape != gray.shape:
+            motion = 1.0
+        else:
+            diff = np.abs(gray.astype(np.int16) - self.reference)
+            motion = np.count_nonzero(diff > self.pixel_delta) / diff.size
+        mask = fire_mask(cv2.cvtColor(small, cv2.COLOR_BGR2HSV))
+        fire = np.count_nonzero(mask) / mask.size
+        return gray, motion, fire
+
+    # Retourne True si la frame doit passer par l'inférence complète
+    def check(self, frame, now=None):
+        now = time.time() if now is None else now
+        gray, self.motion, self.fire = self.scores(frame)
+        if self.motion >= self.motion_threshold or self.fire >= self.fire_threshold:
+            self.hits += 1
+        elif now - self.last_pass >= self.heartbeat:
+            self.heartbeats += 1
+        else:
+            self.misses += 1
+            return False
+        self.reference = gray.astype(np.int16)
+        self.last_pass = now
+        return True
+
+    def stats(self):
+        total = self.hits + self.heartbeats + self.misses
+        ratio = self.misses / total * 100 if total else 0.0
+        return (f"filtre: {self.hits} déclenchements, {self.heartbeats} battements, "
+                f"{self.misses} filtrées ({ratio:.0f} %)")
@@ -0,0 +1,317 @@
+# inference_pool.py - inférence YOLO répartie sur plusieurs processus
+# Un seul processus Python plafonne à environ un cœur (GIL, pré/post-traitement
+# d'Ultralytics). Le pool lance un processus par cœur, chacun avec son modèle ;
+# les images passent par des segments de mémoire partagée réutilisés
+# (multiprocessing.shared_memory) au lieu d'être sérialisées, et seules les
+# détections reviennent : un tableau float32 (x1, y1, x2, y2, conf, classe).
+# Un processus qui meurt est relancé et sa tâche renvoyée une fois à un autre ;
+# une image qui fait tomber deux processus est abandonnée (aucune détection).
+# Un processus qui meurt avant d'avoir chargé son modèle n'est pas relancé ;
+# s'il n'en reste aucun, les images en attente et les suivantes reviennent
+# aussitôt sans détection.
+#   pool = InferencePool(workers=4, model_options=dict(weights="try.pt")).start()
+#   pool.submit(image, callback)   # callback((boxes, confs, classes))
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from multiprocessing import connection, shared_memory
+
+import numpy as np
+
+EMPTY = (np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, int))
+
+
+def pack_detections(boxes, confs, classes):
+    return np.column_stack([boxes, confs, classes]).astype(np.float32).tobytes()
+
+
+def unpack_detections(data):
+    rows = np.frombuffer(data, dtype=np.float32).reshape(-1, 6)
+    return rows[:, :4], rows[:, 4], rows[:, 5].astype(int)
+
+
+# Boucle d'un processus d'inférence : (tâche, segment, forme, conf) -> détections
+def worker_main(conn, model_options, initializer, initargs):
+    if initializer is not None:
+        initializer(*initargs)
+    from model_cache import load_model
+    from tracker import detections_from
+
+    model = load_model(**model_options)
+    conn.send(('ready',))
+    segments = {}  # Segment attaché pour chaque emplacement du pool
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        task_id, slot, name, shape, conf = task
+        segment = segments.get(slot)
+        if segment is None or segment.name != name:
+            # Emplacement agrandi par le processus principal : nouveau segment
+            if segment is not None:
+                try:
+                    segment.close()
+                except BufferError:
+                    pass  # Vue encore gardée par le modèle : libérée avec elle
+            segment = segments[slot] = shared_memory.SharedMemory(name=name)
+        image = np.ndarray(shape, dtype=np.uint8, buffer=segment.buf)
+        try:
+            result = model.predict(source=image, conf=conf, verbose=False)[0]
+            conn.send((task_id, pack_detections(*detections_from(result))))
+        except Exception as e:
+            conn.send((task_id, str(e)))
+        # Plus aucune vue sur le segment, sinon close() échoue
+        result = image = None
+    for segment in segments.values():
+        try:
+            segment.close()
+        except BufferError:
+            pass
+
+
+class Task:
+    __slots__ = ('id', 'slot', 'shape', 'conf', 'callback', 'attempts', 'submitted')
+
+    def __init__(self, task_id, slot, shape, conf, callback):
+        self.id = task_id
+        self.slot = slot
+        self.shape = shape
+        self.conf = conf
+        self.callback = callback
+        self.attempts = 0
+        self.submitted = time.perf_counter()
+
+
+class InferencePool:
+    # workers : nombre de processus (un par cœur par défaut)
+    # model_options : arguments de model_cache.load_model dans chaque processus
+    # slots : images en vol au plus (mémoire partagée bornée)
+    # initializer(*initargs) : appelé au démarrage de chaque processus
+    def __init__(self, workers=None, model_options=None, conf=0.25, slots=None,
+                 initializer=None, initargs=()):
+        self.workers = workers or os.cpu_count() or 1
+        self.model_options = model_options or {}
+        self.conf = conf
+        self.initializer = initializer
+        self.initargs = initargs
+        # spawn partout : pas de fork d'un processus qui a déjà des threads
+        self.context = multiprocessing.get_context('spawn')
+        self.segments = [None] * (slots or 2 * self.workers)
+        self.free_slots = deque(range(len(self.segments)))
+        self.processes = [None] * self.workers
+        self.conns = [None] * self.workers
+        self.loaded = [False] * self.workers  # Modèle chargé par le processus courant
+        self.idle = set()
+        self.busy = {}  # Processus -> tâche en cours
+        self.pending = deque()
+        self.lock = threading.Condition()
+        self.ids = itertools.count(1)
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self.busy_time = 0.0
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name="inference-pool", daemon=True)
+
+    def spawn(self, index):
+        parent, child = self.context.Pipe()
+        process = self.context.Process(target=worker_main, name=f"inference-{index}", daemon=True,
+                                       args=(child, self.model_options, self.initializer,
+                                             self.initargs))
+        process.start()
+        child.close()
+        self.processes[index] = process
+        self.conns[index] = parent
+        self.loaded[index] = False
+
+    def start(self):
+        for index in range(self.workers):
+            self.spawn(index)
+        self.thread.start()
+        return self
+
+    # Attend que tous les processus aient chargé leur modèle ; False si aucun n'y arrive
+    def wait_ready(self, timeout=None):
+        with self.lock:
+            self.lock.wait_for(lambda: all(self.loaded[index] for index in self.live()), timeout)
+            return any(self.loaded)
+
+    def live(self):
+        return [index for index, process in enumerate(self.processes) if process is not None]
+
+    # Copie l'image dans un emplacement libre et la confie au premier processus
+    # disponible ; bloque si toutes les images du pool sont déjà en vol
+    def submit(self, image, callback, conf=None):
+        with self.lock:
+            self.lock.wait_for(lambda: self.free_slots or self.stopped or not self.live())
+            if self.stopped:
+                raise RuntimeError("Pool d'inférence arrêté")
+            live = bool(self.live())
+            if live:
+                slot = self.free_slots.popleft()
+            else:
+                self.failed += 1
+        if not live:
+            # Plus aucun processus capable de charger le modèle : aucune détection
+            callback(EMPTY)
+            return None
+        segment = self.segments[slot]
+        if segment is None or segment.size < image.nbytes:
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+            segment = self.segments[slot] = shared_memory.SharedMemory(create=True,
+                                                                      size=image.nbytes)
+        np.ndarray(image.shape, dtype=np.uint8, buffer=segment.buf)[...] = image
+        task = Task(next(self.ids), slot, image.shape, self.conf if conf is None else conf, callback)
+        with self.lock:
+            live = bool(self.live())
+            if live:
+                self.pending.append(task)
+                self.dispatch()
+            else:
+                # Dernier processus perdu pendant la copie
+                self.free_slots.append(slot)
+                self.failed += 1
+                self.lock.notify_all()
+        if not live:
+            callback(EMPTY)
+            return None
+        return task.id
+
+    def dispatch(self):
+        while self.pending and self.idle:
+            index = self.idle.pop()
+            task = self.pending.popleft()
+            self.busy[index] = task
+            try:
+                self.conns[index].send((task.id, task.slot, self.segments[task.slot].name,
+                                        task.shape, task.conf))
+            except OSError:
+                pass  # Processus mort : relancé par run(), la tâche sera renvoyée
+
+    # Thread de réception : résultats et fin des processus
+    def run(self):
+        while not self.stopped:
+            with self.lock:
+                conns = {self.conns[index]: index for index in self.live()}
+                sentinels = {self.processes[index].sentinel: index for index in self.live()}
+            if not conns:
+                time.sleep(0.5)
+                continue
+            for ready in connection.wait(list(conns) + list(sentinels), timeout=0.5):
+                if self.stopped:
+                    break
+                index = conns.get(ready, sentinels.get(ready))
+                if ready in conns and self.conns[index] is ready:
+                    try:
+                        message = ready.recv()
+                    except (EOFError, OSError):
+                        self.restart(index)
+                        continue
+                    self.receive(index, message)
+                elif (ready in sentinels and self.processes[index] is not None and
+                      self.processes[index].sentinel == ready):
+                    self.restart(index)
+
+    def receive(self, index, message):
+        with self.lock:
+            if message[0] == 'ready':
+                self.loaded[index] = True
+                self.idle.add(index)
+                self.dispatch()
+                self.lock.notify_all()
+                return
+            task = self.busy.pop(index)
+            self.idle.add(index)
+            self.free_slots.append(task.slot)
+            self.busy_time += time.perf_counter() - task.submitted
+            self.completed += 1
+            self.dispatch()
+            self.lock.notify_all()
+        if isinstance(message[1], str):
+            print(f"Erreur d'inférence (processus {index}): {message[1]}")
+            task.callback(EMPTY)
+        else:
+            task.callback(unpack_detections(message[1]))
+
+    def restart(self, index):
+        process = self.processes[index]
+        process.join(timeout=1.0)
+        with self.lock:
+            if self.stopped:
+                return
+            self.conns[index].close()
+            self.idle.discard(index)
+            task = self.busy.pop(index, None)
+            if not self.loaded[index]:
+                # Mort avant d'avoir chargé le modèle : une relance échouerait pareil
+                print(f"Processus d'inférence {index}: échec du chargement du modèle "
+                      f"(code {process.exitcode})")
+                self.processes[index] = self.conns[index] = None
+                failed = []
+                if not self.live():
+                    # Aucun processus restant : les images en attente ne partiront jamais
+                    failed = list(self.pending)
+                    self.pending.clear()
+                    self.free_slots.extend(pending.slot for pending in failed)
+                    self.failed += len(failed)
+                self.lock.notify_all()
+            else:
+                failed = None
+                self.restarts += 1
+                print(f"Processus d'inférence {index} arrêté (code {process.exitcode}), relance")
+                self.spawn(index)
+                if task is not None:
+                    task.attempts += 1
+                    if task.attempts < 2:
+                        # Renvoyée en tête de file, au premier processus libre
+                        self.pending.appendleft(task)
+                        self.dispatch()
+                        task = None
+                    else:
+                        self.free_slots.append(task.slot)
+                        self.failed += 1
+                        self.lock.notify_all()
+        if failed is not None:
+            for pending in failed:
+                pending.callback(EMPTY)
+            return
+        if task is not None:
+            print(f"Image abandonnée après {task.attempts} plantages")
+            task.callback(EMPTY)
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            self.lock.notify_all()
+        live = self.live()
+        for index in live:
+            try:
+                self.conns[index].send(None)
+            except OSError:
+                pass
+        for index in live:
+            self.processes[index].join(timeout=2.0)
+            if self.processes[index].is_alive():
+                self.processes[index].terminate()
+        if self.thread.is_alive():
+            self.thread.join()
+        for index in live:
+            self.conns[index].close()
+        for segment in self.segments:
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+
+    def stats(self):
+        mean = self.busy_time / self.completed * 1000 if self.completed else 0.0
+        return (f"pool: {len(self.live())}/{self.workers} processus, {self.completed} images, "
+                f"{mean:.1f} ms par image (file comprise), {self.restarts} relances, "
+                f"{self.failed} abandonnées")
@@ -0,0 +1,139 @@
+# loadtest_async.py - nombre max de clients au fps cible : asyncio vs Flask threaded
+# Exemple : python loadtest_async.py --mode both --viewers 10 25 50 100 200 400
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# Serveur Flask threaded équivalent à Final1.py, alimenté par la caméra synthétique
+def serve_flask(port, width, height, fps):
+    from flask import Flask, Response
+    from fake_camera import FakeCamera
+    from frame_hub import FrameHub
+    from streaming_output import StreamingOutput
+
+    app = Flask(__name__)
+    hub = FrameHub()
+
+    def generate_frames():
+        for seq, frame in hub.subscribe():
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n'
+                   b'Content-Length: %d\r\n\r\n' % len(frame) + frame + b'\r\n')
+
+    @app.route('/video_feed')
+    def video_feed():
+        return Response(generate_frames(),
+                        mimetype='multipart/x-mixed-replace; boundary=frame')
+
+    FakeCamera(StreamingOutput(hub), width, height, fps).start()
+    app.run(host='127.0.0.1', port=port, threaded=True)
+
+
+def start_server(mode, port, args):
+    if mode == 'async':
+        cmd = [sys.executable, os.path.join(HERE, 'async_server.py'), '--fake',
+               '--host', '127.0.0.1', '--port', str(port)]
+    else:
+        cmd = [sys.executable, os.path.abspath(__file__), '--serve-flask', '--port', str(port)]
+    cmd += ['--width', str(args.width), '--height', str(args.height), '--fps', str(args.fps)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # Attendre que le port accepte les connexions
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            asyncio.run(asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), 1))
+            return proc
+        except (OSError, asyncio.TimeoutError):
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"Le serveur {mode} n'a pas démarré")
+
+
+# Un client MJPEG : compte les frames reçues pendant la durée de mesure
+async def viewer(port, duration, warmup):
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        return 0.0
+    writer.write(b'GET /video_feed HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    frames = 0
+    tail = b''
+    start = time.perf_counter() + warmup
+    end = start + duration
+    try:
+        while True:
+            now = time.perf_counter()
+            if now >= end:
+                break
+            chunk = await asyncio.wait_for(reader.read(256 * 1024), end - now)
+            if not chunk:
+                break
+            if now >= start:
+                data = tail + chunk
+                frames += data.count(b'--frame\r\n')
+                tail = data[-9:]
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    writer.close()
+    return frames / duration
+
+
+async def measure(port, viewers, duration, warmup):
+    return await asyncio.gather(*(viewer(port, duration, warmup) for _ in range(viewers)))
+
+
+def run_mode(mode, args):
+    port = args.port
+    proc = start_server(mode, port, args)
+    best = 0
+    try:
+        for viewers in args.viewers:
+            rates = sorted(asyncio.run(measure(port, viewers, args.duration, args.warmup)))
+            # 10e centile : 90 % des clients doivent tenir le fps cible
+            p10 = rates[len(rates) // 10]
+            ok = p10 >= args.fps * args.tolerance
+            print(f"{mode:<6} clients={viewers:<5} fps médian={rates[len(rates) // 2]:5.1f} "
+                  f"fps p10={p10:5.1f} {'OK' if ok else 'KO'}")
+            if not ok:
+                break
+            best = viewers
+    finally:
+        proc.terminate()
+        proc.wait()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Test de charge du streaming MJPEG')
+    parser.add_argument('--mode', choices=['async', 'flask', 'both'], default='both')
+    parser.add_argument('--viewers', type=int, nargs='+', default=[10, 25, 50, 100, 200, 400])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--tolerance', type=float, default=0.9,
+                        help='Fraction du fps cible à atteindre')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--fps', type=int, default=15)
+    parser.add_argument('--serve-flask', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_flask:
+        serve_flask(args.port, args.width, args.height, args.fps)
+        return
+
+    modes = ['async', 'flask'] if args.mode == 'both' else [args.mode]
+    results = {mode: run_mode(mode, args) for mode in modes}
+    print()
+    for mode, best in results.items():
+        print(f"{mode:<6} clients max à {args.fps} FPS: {best}")
+
+
+if __name__ == '__main__':
+    main()
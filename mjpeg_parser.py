@@ -0,0 +1,104 @@
+# mjpeg_parser.py - analyse incrémentale d'un flux multipart/x-mixed-replace
+import re
+
+SOI = b'\xff\xd8'  # Début d'image JPEG
+EOI = b'\xff\xd9'  # Fin d'image JPEG
+
+CONTENT_LENGTH = re.compile(rb'content-length:\s*(\d+)', re.IGNORECASE)
+
+
+class MJPEGParser:
+    # mode='all' retourne toutes les images complètes, mode='latest' seulement
+    # la plus récente (les autres sont sautées sans être copiées).
+    # Chaque octet n'est examiné qu'une fois : la recherche reprend là où elle
+    # s'était arrêtée au lieu de repartir du début du tampon.
+    def __init__(self, mode='latest'):
+        if mode not in ('all', 'latest'):
+            raise ValueError(f"Mode inconnu: {mode}")
+        self.mode = mode
+        self.buffer = bytearray()
+        self.scan = 0      # Position à partir de laquelle reprendre la recherche
+        self.mark = 0      # Fin de la dernière image extraite
+        self.start = -1    # Position du SOI de l'image en cours, -1 si aucune
+        self.length = None  # Content-Length de la partie en cours, si annoncé
+        self.frames = 0
+        self.skipped = 0
+
+    def feed(self, data):
+        buffer = self.buffer
+        buffer += data
+        found = []
+        while True:
+            if self.start < 0:
+                # Recherche du début de la prochaine image
+                soi = buffer.find(SOI, self.scan)
+                if soi < 0:
+                    # Garder le dernier octet : le marqueur peut être coupé en deux
+                    self.scan = max(self.scan, len(buffer) - 1)
+                    break
+                # Les en-têtes de la partie (s'il y en a) précèdent le SOI
+                match = CONTENT_LENGTH.search(buffer, self.mark, soi)
+                self.length = int(match.group(1)) if match else None
+                self.start = soi
+                self.scan = soi + 2
+
+            if self.length is not None:
+                end = self.start + self.length
+                if len(buffer) < end:
+                    break
+                if buffer[end - 2:end] != EOI:
+                    # Longueur annoncée incohérente : on se rabat sur le marqueur EOI
+                    self.length = None
+                    continue
+            else:
+                eoi = buffer.find(EOI, self.scan)
+                if eoi < 0:
+                    self.scan = max(self.scan, len(buffer) - 1)
+                    break
+                end = eoi + 2
+
+            found.append((self.start, end))
+            # Tout ce qui précède la fin de l'image est consommé
+            self.start = -1
+            self.scan = self.mark = end
+            if self.mode == 'latest' and len(found) > 1:
+                self.skipped += 1
+                found.pop(0)
+
+        # Une seule copie par image extraite
+        with memoryview(buffer) as view:
+            frames = [bytes(view[a:b]) for a, b in found]
+        self.frames += len(frames)
+        self._compact()
+        return frames
+
+    # Supprime les octets déjà traités ; le bytearray garde sa capacité
+    def _compact(self):
+        if self.start >= 0:
+            consumed = self.start
+        elif self.scan - self.mark > 64 * 1024:
+            # Pas de SOI depuis longtemps : données parasites, on les jette
+            consumed = self.scan
+        else:
+            # On garde les en-têtes de la prochaine partie (Content-Length)
+            consumed = self.mark
+        if consumed:
+            del self.buffer[:consumed]
+            self.scan -= consumed
+            self.mark = max(self.mark - consumed, 0)
+            if self.start >= 0:
+                self.start -= consumed
+
+
+# Lit le flux par gros blocs dès que les données sont disponibles
+# (read1 ne bloque pas jusqu'à remplir le bloc, contrairement à read)
+def iter_chunks(raw, chunk_size=256 * 1024):
+    read1 = getattr(raw, 'read1', None)
+    if read1 is None:
+        # urllib3 < 2 : on passe par la réponse http.client sous-jacente
+        read1 = raw._fp.read1
+    while True:
+        data = read1(chunk_size)
+        if not data:
+            break
+        yield data
@@ -0,0 +1,121 @@
+# model_cache.py - export de try.pt vers un runtime CPU optimisé, mis en cache sur disque
+# Le premier lancement exporte le modèle (ONNX Runtime ou OpenVINO, INT8 en
+# option) dans cache_dir ; les suivants chargent directement l'export. La clé
+# du cache contient l'empreinte des poids et la taille d'entrée : réentraîner
+# try.pt ou changer imgsz produit un nouvel export. En cas d'échec on revient
+# au modèle PyTorch d'origine.
+# L'INT8 OpenVINO demande un jeu de calibration (data, yaml Ultralytics) : sans
+# lui, Ultralytics téléchargerait coco8, ce qui échoue hors ligne ; l'export
+# reste alors en FP32.
+#   model = load_model("try.pt", backend="auto", imgsz=640)
+import hashlib
+import importlib.util
+import os
+import shutil
+import tempfile
+import time
+
+BACKENDS = ('auto', 'torch', 'onnx', 'openvino')
+
+
+def weights_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+# OpenVINO est le plus rapide sur CPU Intel, ONNX Runtime partout ailleurs
+def pick_backend(backend):
+    if backend != 'auto':
+        return backend
+    if importlib.util.find_spec('openvino') is not None:
+        return 'openvino'
+    if importlib.util.find_spec('onnxruntime') is not None:
+        return 'onnx'
+    return 'torch'
+
+
+def cache_path(weights, backend, imgsz, int8, cache_dir):
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    name = f"{stem}-{weights_hash(weights)}-{imgsz}{'-int8' if int8 else ''}"
+    if backend == 'onnx':
+        return os.path.join(cache_dir, name + '.onnx')
+    return os.path.join(cache_dir, name + '_openvino_model')
+
+
+def export(weights, backend, imgsz, int8, target, data=None):
+    from ultralytics import YOLO
+
+    directory = os.path.dirname(target) or '.'
+    os.makedirs(directory, exist_ok=True)
+    # Ultralytics écrit l'export à côté des poids : on exporte une copie dans un
+    # dossier temporaire pour ne pas écraser try.onnx (modèle de la Pi, Final1.py)
+    with tempfile.TemporaryDirectory(dir=directory) as work:
+        copy = os.path.join(work, os.path.basename(weights))
+        shutil.copyfile(weights, copy)
+        model = YOLO(copy)
+        if backend == 'onnx':
+            # Lot dynamique : app_pc envoie une frame par caméra dans le même predict
+            exported = model.export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+            if int8:
+                # Quantification dynamique des poids (pas besoin de jeu de calibration)
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+                quantized = os.path.join(work, 'int8.onnx')
+                quantize_dynamic(exported, quantized, weight_type=QuantType.QUInt8)
+                exported = quantized
+        else:
+            options = dict(format='openvino', imgsz=imgsz, dynamic=True, int8=int8)
+            if int8:
+                if not data:
+                    raise ValueError("INT8 OpenVINO: jeu de calibration (data) requis")
+                options['data'] = data  # Images de calibration (yaml Ultralytics)
+            exported = model.export(**options)
+        # Écriture atomique : un export interrompu ne laisse pas de cache à moitié écrit
+        temporary = target + '.tmp'
+        shutil.rmtree(temporary, ignore_errors=True)
+        shutil.move(exported, temporary)
+        os.replace(temporary, target)
+    return target
+
+
+def warm_up(model, imgsz):
+    import numpy as np
+
+    start = time.perf_counter()
+    model.predict(source=np.zeros((imgsz, imgsz, 3), dtype=np.uint8), verbose=False)
+    return time.perf_counter() - start
+
+
+# Retourne un modèle Ultralytics (predict, names, plot...) quel que soit le runtime
+def load_model(weights="try.pt", backend="auto", imgsz=640, int8=False,
+               cache_dir=".model_cache", data=None, warmup=True):
+    from ultralytics import YOLO
+
+    start = time.perf_counter()
+    backend = pick_backend(backend)
+    if backend == 'openvino' and int8 and not data:
+        print("INT8 OpenVINO sans jeu de calibration (--calibration) : export en FP32")
+        int8 = False
+    model = None
+    if backend != 'torch' and os.path.exists(weights):
+        try:
+            target = cache_path(weights, backend, imgsz, int8, cache_dir)
+            if not os.path.exists(target):
+                print(f"Export de {weights} vers {backend} (une seule fois)...")
+                export(weights, backend, imgsz, int8, target, data)
+            model = YOLO(target, task='detect')
+        except Exception as e:
+            print(f"Runtime {backend} indisponible ({e}), retour à PyTorch")
+            backend = 'torch'
+    if model is None:
+        backend = 'torch'
+        model = YOLO(weights)
+    loaded = time.perf_counter() - start
+    message = f"Modèle {weights} chargé avec {backend} en {loaded:.2f} s"
+    if warmup:
+        message += f", préchauffage {warm_up(model, imgsz) * 1000:.0f} ms"
+    print(message)
+    model.backend = backend
+    return model
@@ -1,14 +1,11 @@
 # app_optimized.py pour la Raspberry Pi
 from flask import Flask, Response
-import cv2
-import numpy as np
+import argparse
 import socket
 import time
 import threading
-from picamera2 import Picamera2
-from picamera2.encoders import JpegEncoder
-from picamera2.outputs import FileOutput
-import io
+from camera_sources import open_source
+from streaming_output import StreamingOutput
 
 app = Flask(__name__)
 
@@ -17,44 +14,18 @@ frame_width = 640
 frame_height = 480
 fps = 15
 quality = 80  # Qualité JPEG (0-100)
+camera_source = "picamera2"  # picamera2, synthetic, v4l2:0, file:video.mp4
 
 # Buffer circulaire pour le dernier frame
 latest_frame = None
 frame_lock = threading.Lock()
 
-class StreamingOutput(io.BufferedIOBase):
-    def __init__(self):
-        self.frame = None
-        self.buffer = io.BytesIO()
-        self.condition = threading.Condition()
-
-    def write(self, buf):
-        if buf.startswith(b'\xff\xd8'):
-            # Nouveau frame JPEG
-            self.buffer.seek(0)
-            self.buffer.truncate()
-            self.buffer.write(buf)
-            with self.condition:
-                self.frame = self.buffer.getvalue()
-                self.condition.notify_all()
-        else:
-            self.buffer.write(buf)
-        return len(buf)
-
-# Initialisation de la caméra en mode haute performance
+# Initialisation de la caméra : elle chauffe en arrière-plan pendant que le
+# serveur accepte déjà les connexions
 def initialize_camera():
-    camera = Picamera2()
-    camera_config = camera.create_video_configuration(
-        main={"size": (frame_width, frame_height), "format": "RGB888"},
-        controls={"FrameRate": fps},
-        buffer_count=4
-    )
-    camera.configure(camera_config)
-    
-    # Configurer l'encodeur JPEG en mémoire
-    encoder = JpegEncoder(q=quality)
+    camera = open_source(camera_source, frame_width, frame_height, fps, quality)
     output = StreamingOutput()
-    camera.start_recording(encoder, FileOutput(output))
+    camera.start_in_background(output)
     
     return camera, output
 
@@ -76,7 +47,8 @@ def generate_frames():
         with frame_lock:
             if latest_frame is not None:
                 yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + latest_frame + b'\r\n')
+                       b'Content-Type: image/jpeg\r\n'
+                       b'Content-Length: %d\r\n\r\n' % len(latest_frame) + latest_frame + b'\r\n')
                        
         # Contrôle de débit pour réduire la charge CPU
         time.sleep(1/fps)
@@ -122,6 +94,12 @@ def index():
     """
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serveur de flux vidéo optimisé pour la Raspberry Pi')
+    parser.add_argument('--camera', type=str, default=camera_source,
+                        help='Source vidéo: picamera2, synthetic, v4l2:0, file:video.mp4')
+    args = parser.parse_args()
+    camera_source = args.camera
+    
     # Initialiser la caméra
     camera, output = initialize_camera()
     
@@ -0,0 +1,211 @@
+# photo_index.py - index SQLite des photos et cache de vignettes
+# L'index est tenu à jour au fil des écritures (CaptureService) ; sync() ne
+# relit que les fichiers nouveaux ou modifiés. La pagination se fait par
+# curseur (date, nom) sur un index : une page coûte le même prix à la
+# 1re page qu'à la 2000e.
+import os
+import sqlite3
+import struct
+import threading
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    filename TEXT PRIMARY KEY,
+    taken REAL NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    width INTEGER,
+    height INTEGER
+);
+CREATE INDEX IF NOT EXISTS photos_taken ON photos (taken, filename);
+CREATE TABLE IF NOT EXISTS tags (
+    filename TEXT NOT NULL REFERENCES photos (filename) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (tag, filename)
+);
+CREATE INDEX IF NOT EXISTS tags_filename ON tags (filename);
+"""
+
+
+# Dimensions d'un JPEG sur disque : on saute de segment en segment jusqu'au SOF
+def jpeg_dimensions(path):
+    with open(path, 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            return None, None
+        while True:
+            header = f.read(4)
+            if len(header) < 4 or header[0] != 0xff:
+                return None, None
+            marker = header[1]
+            length = struct.unpack('>H', header[2:])[0]
+            if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+                height, width = struct.unpack('>xHH', f.read(5))
+                return width, height
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+# Heure de prise de vue lue dans le nom (20250101_120000[_123].jpg), sinon mtime
+def taken_time(filename, mtime):
+    stem = os.path.splitext(filename)[0]
+    try:
+        taken = datetime.strptime(stem[:15], "%Y%m%d_%H%M%S").timestamp()
+    except ValueError:
+        return mtime
+    if stem[15:16] == "_" and stem[16:].isdigit():
+        taken += int(stem[16:]) / 1000
+    return taken
+
+
+class PhotoIndex:
+    # La base reste hors du dossier des photos, qui est servi tel quel
+    def __init__(self, photo_dir, db_path):
+        self.photo_dir = photo_dir
+        self.db_path = db_path
+        self.lock = threading.Lock()  # Une connexion partagée par les threads Flask
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def row(self, filename, width=None, height=None):
+        path = os.path.join(self.photo_dir, filename)
+        stat = os.stat(path)
+        if width is None:
+            width, height = jpeg_dimensions(path)
+        return (filename, taken_time(filename, stat.st_mtime), stat.st_size, stat.st_mtime,
+                width, height)
+
+    def insert(self, rows):
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO photos (filename, taken, size, mtime, width, height) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    # Ajoute ou met à jour une photo ; width/height évitent de relire le fichier
+    def add(self, filename, width=None, height=None, tags=()):
+        self.insert([self.row(filename, width, height)])
+        if tags:
+            self.tag(filename, *tags)
+
+    # False si la photo n'est pas dans l'index
+    def tag(self, filename, *tags):
+        with self.lock, self.db:
+            if self.db.execute("SELECT 1 FROM photos WHERE filename = ?", (filename,)).fetchone() is None:
+                return False
+            self.db.executemany("INSERT OR IGNORE INTO tags (filename, tag) VALUES (?, ?)",
+                                [(filename, tag) for tag in tags])
+        return True
+
+    # Rattrapage incrémental (photos copiées à la main, index perdu...)
+    def sync(self):
+        with self.lock:
+            known = {row[0]: (row[1], row[2])
+                     for row in self.db.execute("SELECT filename, size, mtime FROM photos")}
+        seen = set()
+        changed = []
+        with os.scandir(self.photo_dir) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith('.jpg') or entry.name.startswith('.'):
+                    continue
+                seen.add(entry.name)
+                stat = entry.stat()
+                if known.get(entry.name) != (stat.st_size, stat.st_mtime):
+                    changed.append(entry.name)
+        rows = []
+        for filename in changed:
+            try:
+                rows.append(self.row(filename))
+            except OSError:
+                continue  # Supprimée entre-temps
+            if len(rows) == 1000:
+                self.insert(rows)
+                rows = []
+        self.insert(rows)
+        removed = [(name,) for name in known if name not in seen]
+        with self.lock, self.db:
+            self.db.executemany("DELETE FROM photos WHERE filename = ?", removed)
+        return len(changed), len(removed)
+
+    # Une page de photos, des plus récentes aux plus anciennes.
+    # before : curseur (taken, filename) de la dernière photo de la page précédente
+    def query(self, limit=50, before=None, since=None, until=None, tag=None):
+        clauses = []
+        params = []
+        if before is not None:
+            clauses.append("(taken, filename) < (?, ?)")
+            params.extend(before)
+        if since is not None:
+            clauses.append("taken >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("taken < ?")
+            params.append(until)
+        if tag is not None:
+            clauses.append("filename IN (SELECT filename FROM tags WHERE tag = ?)")
+            params.append(tag)
+        where = "WHERE " + " AND ".join(clauses) if clauses else ""
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT * FROM photos {where} ORDER BY taken DESC, filename DESC LIMIT ?",
+                params + [limit]).fetchall()
+            photos = [dict(row) for row in rows]
+            if photos:
+                marks = ",".join("?" * len(photos))
+                tags = self.db.execute(
+                    f"SELECT filename, tag FROM tags WHERE filename IN ({marks})",
+                    [photo["filename"] for photo in photos]).fetchall()
+        by_name = {photo["filename"]: photo for photo in photos}
+        for photo in photos:
+            photo["tags"] = []
+        if photos:
+            for filename, tag in tags:
+                by_name[filename]["tags"].append(tag)
+        cursor = (photos[-1]["taken"], photos[-1]["filename"]) if len(photos) == limit else None
+        return photos, cursor
+
+    def count(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM photos").fetchone()[0]
+
+
+class ThumbnailCache:
+    # Vignettes générées une seule fois, refaites si la photo est plus récente
+    def __init__(self, photo_dir, width=320, quality=80):
+        self.photo_dir = photo_dir
+        self.thumb_dir = os.path.join(photo_dir, "thumbs")
+        self.width = width
+        self.quality = quality
+        self.lock = threading.Lock()
+        os.makedirs(self.thumb_dir, exist_ok=True)
+
+    def path(self, filename):
+        source = os.path.join(self.photo_dir, filename)
+        thumb = os.path.join(self.thumb_dir, filename)
+        try:
+            if os.stat(thumb).st_mtime >= os.stat(source).st_mtime:
+                return thumb
+        except FileNotFoundError:
+            pass
+        with self.lock:
+            self.generate(source, thumb)
+        return thumb
+
+    def generate(self, source, thumb):
+        import cv2
+
+        # Décodage à 1/4 directement dans libjpeg : bien plus rapide qu'un décodage complet
+        image = cv2.imread(source, cv2.IMREAD_REDUCED_COLOR_4)
+        if image is None:
+            raise FileNotFoundError(source)
+        height, width = image.shape[:2]
+        if width > self.width:
+            size = (self.width, max(1, height * self.width // width))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        temporary = os.path.join(self.thumb_dir, ".tmp_" + os.path.basename(thumb))
+        cv2.imwrite(temporary, image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        os.replace(temporary, thumb)
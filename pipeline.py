@@ -0,0 +1,277 @@
+# pipeline.py - étages réception / décodage / inférence / affichage
+# Chaque étage tourne dans son propre thread et ne garde que l'élément le plus
+# récent (FrameHub) : un étage lent saute les frames périmées au lieu de les
+# accumuler, et ne traite jamais deux fois la même frame.
+import functools
+import itertools
+import threading
+import time
+from collections import deque
+
+from frame_hub import FrameHub
+
+
+class Packet:
+    _ids = itertools.count(1)
+
+    # header : FrameHeader du transport binaire (frame_transport.py) ; jpeg est
+    # alors la charge utile, JPEG ou image brute selon header.format
+    def __init__(self, jpeg, source=None, header=None):
+        self.frame_id = next(self._ids)
+        self.source = source  # Caméra d'origine
+        self.jpeg = jpeg
+        self.header = header
+        self.received = time.time()  # Heure de réception sur le PC
+        self.image = None
+        self.analyse = True  # False si le filtre a jugé l'inférence inutile
+        self.results = None
+        self.tracks = None  # Pistes suivies entre deux détections (tracker.py)
+        self.annotated = None  # JPEG annoté, encodé seulement s'il a des spectateurs (restream.py)
+        self.tiles = None  # Tuiles analysées (tiling.py), avec un pool de processus
+
+
+class Stage:
+    # func(packet) retourne le paquet à transmettre, ou None pour l'abandonner
+    def __init__(self, name, func, source, sink=None):
+        self.name = name
+        self.func = func
+        self.source = source
+        self.sink = sink if sink is not None else FrameHub()
+        self.processed = 0
+        self.dropped = 0  # Frames périmées sautées faute de temps
+        self.latency = 0.0  # Somme des délais réception -> sortie de l'étage
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        seq = 0
+        while not self.stopped and not self.source.closed:
+            new_seq, packet = self.source.wait_next(seq, timeout=0.5)
+            if packet is None:
+                continue
+            if seq:
+                self.dropped += new_seq - seq - 1
+            seq = new_seq
+            try:
+                packet = self.func(packet)
+            except Exception as e:
+                print(f"Erreur dans l'étage {self.name}: {e}")
+                continue
+            if packet is not None:
+                self.latency += time.time() - packet.received
+                self.sink.publish(packet)
+                self.processed += 1
+
+    def stop(self):
+        self.stopped = True
+        self.sink.close()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def stats(self):
+        latency = self.latency / self.processed * 1000 if self.processed else 0.0
+        return (f"{self.name}: {self.processed} traitées, {self.dropped} sautées, "
+                f"latence moyenne {latency:.1f} ms")
+
+
+# Étage d'inférence groupée : rassemble la frame la plus récente de chaque
+# source et fait un seul appel func(paquets) pour tout le lot.
+# Les résultats repartent vers un FrameHub par source.
+class BatchStage:
+    def __init__(self, name, func, sources):
+        self.name = name
+        self.func = func
+        self.sources = sources
+        self.sinks = [FrameHub() for _ in sources]
+        self.ready = threading.Event()
+        for hub in sources:
+            hub.add_listener(self._on_frame)
+        self.batches = 0
+        self.processed = [0] * len(sources)
+        self.dropped = [0] * len(sources)
+        self.latency = [0.0] * len(sources)
+        self.started = None
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+
+    def _on_frame(self, seq, packet):
+        self.ready.set()
+
+    def start(self):
+        self.started = time.time()
+        self.thread.start()
+        return self
+
+    def run(self):
+        seqs = [0] * len(self.sources)
+        while not self.stopped:
+            if not self.ready.wait(0.5):
+                continue
+            self.ready.clear()
+            # Frames arrivées depuis le dernier lot, une au plus par source
+            batch, slots = [], []
+            for i, hub in enumerate(self.sources):
+                seq, packet = hub.wait_next(seqs[i], timeout=0)
+                if packet is None:
+                    continue
+                if seqs[i]:
+                    self.dropped[i] += seq - seqs[i] - 1
+                seqs[i] = seq
+                batch.append(packet)
+                slots.append(i)
+            if not batch:
+                continue
+            try:
+                batch = self.func(batch)
+            except Exception as e:
+                print(f"Erreur dans l'étage {self.name}: {e}")
+                continue
+            self.batches += 1
+            now = time.time()
+            for i, packet in zip(slots, batch):
+                self.latency[i] += now - packet.received
+                self.processed[i] += 1
+                self.sinks[i].publish(packet)
+
+    def stop(self):
+        self.stopped = True
+        for hub in self.sinks:
+            hub.close()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    # Statistiques par source : fps analysés et latence moyenne
+    def stats(self, names=None):
+        elapsed = max(time.time() - (self.started or time.time()), 1e-6)
+        lines = [f"{self.name}: {self.batches} lots"]
+        for i in range(len(self.sources)):
+            name = names[i] if names else i
+            done = self.processed[i]
+            latency = self.latency[i] / done * 1000 if done else 0.0
+            lines.append(f"  {name}: {done / elapsed:.1f} fps, {self.dropped[i]} sautées, "
+                         f"latence moyenne {latency:.1f} ms")
+        return "\n".join(lines)
+
+
+# Étage d'inférence sur un pool de processus (inference_pool.py) : chaque
+# frame est confiée à un processus libre, jusqu'à depth frames en vol par
+# source, et les résultats repartent dans l'ordre d'arrivée de chaque source.
+# prepare(paquet) retourne les images à analyser (aucune si la frame est
+# filtrée, plusieurs pour les tuiles) ; finish(paquet, détections) est appelé
+# dans l'ordre des frames de la source, avec les détections de chaque image.
+class PoolStage:
+    def __init__(self, name, pool, sources, prepare, finish, depth=2):
+        self.name = name
+        self.pool = pool
+        self.sources = sources
+        self.prepare = prepare
+        self.finish = finish
+        self.depth = depth
+        self.sinks = [FrameHub() for _ in sources]
+        self.inflight = [deque() for _ in sources]  # [paquet, restantes, détections]
+        self.condition = threading.Condition()
+        self.ready = threading.Event()
+        for hub in sources:
+            hub.add_listener(self._on_frame)
+        self.processed = [0] * len(sources)
+        self.dropped = [0] * len(sources)
+        self.latency = [0.0] * len(sources)
+        self.started = None
+        self.stopped = False
+        self.threads = [threading.Thread(target=self.run, name=name, daemon=True)]
+        self.threads += [threading.Thread(target=self.deliver, args=(i,), name=f"{name} {i}",
+                                          daemon=True)
+                         for i in range(len(sources))]
+
+    def _on_frame(self, seq, packet):
+        self.ready.set()
+
+    def start(self):
+        self.started = time.time()
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    # Répartition : la frame la plus récente de chaque source qui a de la place
+    def run(self):
+        seqs = [0] * len(self.sources)
+        while not self.stopped:
+            if not self.ready.wait(0.5):
+                continue
+            self.ready.clear()
+            for i, hub in enumerate(self.sources):
+                if len(self.inflight[i]) >= self.depth:
+                    continue
+                seq, packet = hub.wait_next(seqs[i], timeout=0)
+                if packet is None:
+                    continue
+                if seqs[i]:
+                    self.dropped[i] += seq - seqs[i] - 1
+                seqs[i] = seq
+                try:
+                    images = self.prepare(packet)
+                except Exception as e:
+                    print(f"Erreur dans l'étage {self.name}: {e}")
+                    continue
+                entry = [packet, len(images), [None] * len(images)]
+                with self.condition:
+                    self.inflight[i].append(entry)
+                    self.condition.notify_all()
+                try:
+                    for j, image in enumerate(images):
+                        self.pool.submit(image, functools.partial(self._done, entry, j))
+                except RuntimeError:
+                    return  # Pool arrêté
+
+    def _done(self, entry, index, detections):
+        with self.condition:
+            entry[2][index] = detections
+            entry[1] -= 1
+            self.condition.notify_all()
+
+    # Publication dans l'ordre : une frame sort quand elle et ses aînées sont finies
+    def deliver(self, i):
+        queue = self.inflight[i]
+        while not self.stopped:
+            with self.condition:
+                if not self.condition.wait_for(lambda: queue and queue[0][1] == 0 or self.stopped,
+                                               timeout=0.5) or self.stopped:
+                    continue
+                packet, _, detections = queue[0]
+            try:
+                packet = self.finish(packet, detections)
+            except Exception as e:
+                print(f"Erreur dans l'étage {self.name}: {e}")
+                packet = None
+            with self.condition:
+                queue.popleft()
+            self.ready.set()  # Place libérée pour la source
+            if packet is not None:
+                self.latency[i] += time.time() - packet.received
+                self.processed[i] += 1
+                self.sinks[i].publish(packet)
+
+    def stop(self):
+        self.stopped = True
+        with self.condition:
+            self.condition.notify_all()
+        for hub in self.sinks:
+            hub.close()
+        for thread in self.threads:
+            if thread.is_alive():
+                thread.join()
+
+    def stats(self, names=None):
+        elapsed = max(time.time() - (self.started or time.time()), 1e-6)
+        lines = [f"{self.name}: {self.pool.stats()}"]
+        for i in range(len(self.sources)):
+            name = names[i] if names else i
+            done = self.processed[i]
+            latency = self.latency[i] / done * 1000 if done else 0.0
+            lines.append(f"  {name}: {done / elapsed:.1f} fps, {self.dropped[i]} sautées, "
+                         f"latence moyenne {latency:.1f} ms")
+        return "\n".join(lines)
@@ -0,0 +1,133 @@
+# restream.py - re-diffusion HTTP du flux annoté et des détections (client PC sans écran)
+#   /                      liste des caméras
+#   /stream/<n>            flux MJPEG annoté de la caméra n
+#   /detections[/<n>]      dernières détections en JSON
+#   /api/detections[/summary]  historique (event_store.py), si activé
+#   /metrics               métriques Prometheus
+# Le dessin et l'encodage ne se font que si quelqu'un regarde la caméra, une
+# seule fois par frame pour tous les spectateurs (étage d'annotation).
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from metrics import registry
+
+PART_HEADER = (b'--frame\r\n'
+               b'Content-Type: image/jpeg\r\n'
+               b'Content-Length: %d\r\n\r\n')
+
+
+class AnnotatedStreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    # cameras : [(nom, url source, FrameHub des paquets annotés)]
+    # describe(packet) : dictionnaire JSON des détections d'un paquet
+    # history : EventStore de l'historique, None si désactivé
+    def __init__(self, cameras, describe, host='0.0.0.0', port=8000, history=None):
+        self.cameras = cameras
+        self.describe = describe
+        self.history = history
+        self.viewers = {url: 0 for _, url, _ in cameras}
+        self.lock = threading.Lock()
+        super().__init__((host, port), RestreamHandler)
+
+    # Appelé par l'étage d'annotation : faut-il dessiner et encoder ?
+    def watched(self, url):
+        return self.viewers.get(url, 0) > 0
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="restream", daemon=True).start()
+        return self
+
+    def detections(self, index):
+        name, _, hub = self.cameras[index]
+        packet = hub.frame
+        result = {"camera": name, "frame_id": None, "received": None, "detections": []}
+        if packet is not None:
+            result.update(frame_id=packet.frame_id, received=packet.received,
+                          detections=self.describe(packet))
+        return result
+
+
+class RestreamHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+        parts = path.split('/')
+        try:
+            if path == '':
+                self.index()
+            elif path == '/metrics':
+                self.send_body(registry.render().encode(), 'text/plain; version=0.0.4')
+            elif path == '/detections':
+                self.send_json([self.server.detections(i) for i in range(len(self.server.cameras))])
+            elif len(parts) == 3 and parts[1] == 'detections':
+                self.send_json(self.server.detections(self.camera_index(parts[2])))
+            elif len(parts) == 3 and parts[1] == 'stream':
+                self.stream(self.camera_index(parts[2]))
+            elif path in ('/api/detections', '/api/detections/summary') and self.server.history is not None:
+                self.history(summary=path.endswith('/summary'))
+            else:
+                self.send_error(404)
+        except (IndexError, ValueError):
+            self.send_error(404)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def camera_index(self, value):
+        index = int(value)
+        if not 0 <= index < len(self.server.cameras):
+            raise IndexError(index)
+        return index
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, value):
+        self.send_body(json.dumps(value).encode(), 'application/json')
+
+    def history(self, summary):
+        query = {key: values[0] for key, values in parse_qs(self.path.partition('?')[2]).items()}
+        result = self.server.history.api(query, summary=summary)
+        if result is None:
+            self.send_error(400, "Paramètre invalide")
+        else:
+            self.send_json(result)
+
+    def index(self):
+        rows = "".join(f'<li>{name} : <a href="/stream/{i}">flux annoté</a> · '
+                       f'<a href="/detections/{i}">détections</a></li>'
+                       for i, (name, _, _) in enumerate(self.server.cameras))
+        self.send_body(f"<h1>Détection d'incendies</h1><ul>{rows}</ul>".encode(),
+                       'text/html; charset=utf-8')
+
+    def stream(self, index):
+        server = self.server
+        _, url, hub = server.cameras[index]
+        self.send_response(200)
+        self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=frame')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        with server.lock:
+            server.viewers[url] += 1
+        try:
+            seq = 0
+            while not hub.closed:
+                seq, packet = hub.wait_next(seq, timeout=5.0)
+                # Les frames publiées avant l'arrivée du spectateur ne sont pas encodées
+                if packet is None or packet.annotated is None:
+                    continue
+                self.wfile.write(PART_HEADER % len(packet.annotated))
+                self.wfile.write(packet.annotated)
+                self.wfile.write(b'\r\n')
+        finally:
+            with server.lock:
+                server.viewers[url] -= 1
+
+    def log_message(self, format, *args):
+        pass
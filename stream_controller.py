@@ -0,0 +1,211 @@
+# stream_controller.py - réglage automatique du flux de la Pi selon la charge
+# Toutes les `interval` secondes, le contrôleur mesure :
+#   - la part du temps passée à encoder (durée d'encodage x fps) ;
+#   - le retard de capture (fps obtenu / fps demandé) ;
+#   - l'occupation CPU (/proc/stat) et la température du SoC ;
+#   - les frames sautées par les clients trop lents (sockets saturés).
+# Chaque mesure est ramenée à une pression (1.0 = limite). Au-dessus de `high`
+# pendant down_after relevés, on dégrade d'un cran ; sous `low` pendant
+# up_after relevés, on remonte d'un cran. Les deux seuils et les délais
+# asymétriques évitent les oscillations, et une remontée suivie d'une
+# rechute double l'attente avant la suivante.
+# Le cran dégradé dépend de la cause : pour le CPU on baisse d'abord le fps,
+# pour le réseau d'abord la qualité JPEG ; la résolution vient en dernier.
+# Tout reste dans les bornes fixées par l'opérateur, sans redémarrer la caméra.
+import threading
+import time
+
+QUALITY_STEP = 10
+FPS_STEP = 0.75     # Facteur appliqué au fps à chaque cran
+SCALES = (1.0, 0.75, 0.5, 0.25)
+
+# Ordre de dégradation selon la cause ; la remontée se fait dans l'ordre inverse
+CPU_ORDER = ('fps', 'quality', 'scale')
+NETWORK_ORDER = ('quality', 'fps', 'scale')
+CPU_CAUSES = ('encode', 'capture', 'cpu', 'temperature')
+
+
+def cpu_temperature(path='/sys/class/thermal/thermal_zone0/temp'):
+    try:
+        with open(path) as f:
+            return int(f.read()) / 1000
+    except (OSError, ValueError):
+        return None
+
+
+# Temps CPU (occupé, total) cumulés depuis le démarrage, None hors Linux
+def cpu_times():
+    try:
+        with open('/proc/stat') as f:
+            values = [int(value) for value in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+    return sum(values) - idle, sum(values)
+
+
+class AdaptiveController:
+    # camera : CameraSource (adjust, encode_time) ; hub : FrameHub des JPEG
+    # Les maxima sont les réglages de départ, les minima les bornes de l'opérateur
+    def __init__(self, camera, hub, max_quality=80, min_quality=40, max_fps=15, min_fps=5,
+                 min_scale=0.5, max_temperature=75.0, max_cpu=0.9, max_encode=0.7,
+                 max_drop=0.2, interval=2.0, high=1.0, low=0.7, down_after=2, up_after=5,
+                 on_change=None):
+        self.camera = camera
+        self.hub = hub
+        self.max_quality = max_quality
+        self.min_quality = min(min_quality, max_quality)
+        self.max_fps = max_fps
+        self.min_fps = min(min_fps, max_fps)
+        self.scales = [scale for scale in SCALES if scale >= min_scale] or [1.0]
+        self.max_temperature = max_temperature
+        self.max_cpu = max_cpu
+        self.max_encode = max_encode
+        self.max_drop = max_drop
+        self.interval = interval
+        self.high = high
+        self.low = low
+        self.down_after = down_after
+        self.up_after = up_after
+        self.on_change = on_change  # Appelé après chaque changement de réglage
+        self.quality = max_quality
+        self.fps = max_fps
+        self.scale = 1.0
+        self.hold = up_after  # Relevés calmes exigés avant de remonter
+        self.over = 0
+        self.under = 0
+        self.last_up = None
+        self.reason = None
+        self.changes = 0
+        self.pressures = {}
+        # Frames envoyées et sautées par les clients depuis le dernier relevé
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.dropped = 0
+        self.last_seq = hub.seq
+        self.last_time = time.monotonic()
+        self.last_cpu = cpu_times()
+        self.stopped = False
+
+    # Appelé par chaque client /video_feed à chaque frame reçue du hub ;
+    # sent=0 pour une frame supprimée (?changes=1), jamais envoyée sur le réseau
+    def client_frame(self, skipped=0, sent=1):
+        with self.lock:
+            self.sent += sent
+            self.dropped += skipped
+
+    def measure(self):
+        now = time.monotonic()
+        elapsed = max(now - self.last_time, 1e-6)
+        pressures = {}
+        # Frames réellement publiées face au fps demandé (20 % de retard = limite)
+        achieved = (self.hub.seq - self.last_seq) / elapsed
+        pressures['capture'] = max(0.0, 1 - achieved / self.fps) / 0.2
+        if self.camera.encode_time:
+            pressures['encode'] = self.camera.encode_time * self.fps / self.max_encode
+        busy = cpu_times()
+        if busy is not None and self.last_cpu is not None and busy[1] > self.last_cpu[1]:
+            pressures['cpu'] = ((busy[0] - self.last_cpu[0]) / (busy[1] - self.last_cpu[1])
+                                / self.max_cpu)
+        temperature = cpu_temperature()
+        if temperature is not None:
+            # Limite à max_temperature, remontée possible seulement 6 °C en dessous
+            pressures['temperature'] = max(0.0, temperature - self.max_temperature + 20) / 20
+        with self.lock:
+            sent, dropped = self.sent, self.dropped
+            self.sent = self.dropped = 0
+        if sent + dropped:
+            pressures['network'] = dropped / (sent + dropped) / self.max_drop
+        self.last_seq, self.last_time, self.last_cpu = self.hub.seq, now, busy
+        return pressures
+
+    def lower(self, knob):
+        if knob == 'quality' and self.quality > self.min_quality:
+            self.quality = max(self.min_quality, self.quality - QUALITY_STEP)
+        elif knob == 'fps' and self.fps > self.min_fps:
+            self.fps = max(self.min_fps, round(self.fps * FPS_STEP))
+        elif knob == 'scale' and self.scale > self.scales[-1]:
+            self.scale = self.scales[self.scales.index(self.scale) + 1]
+        else:
+            return False
+        return True
+
+    def raise_(self, knob):
+        if knob == 'quality' and self.quality < self.max_quality:
+            self.quality = min(self.max_quality, self.quality + QUALITY_STEP)
+        elif knob == 'fps' and self.fps < self.max_fps:
+            self.fps = min(self.max_fps, max(self.fps + 1, round(self.fps / FPS_STEP)))
+        elif knob == 'scale' and self.scale < 1.0:
+            self.scale = self.scales[self.scales.index(self.scale) - 1]
+        else:
+            return False
+        return True
+
+    def step_down(self, cause):
+        order = CPU_ORDER if cause in CPU_CAUSES else NETWORK_ORDER
+        if not any(self.lower(knob) for knob in order):
+            return False
+        # Rechute juste après une remontée : on attendra plus longtemps la prochaine fois
+        if self.last_up is not None and time.monotonic() - self.last_up < 2 * self.hold * self.interval:
+            self.hold = min(self.hold * 2, 16 * self.up_after)
+        self.reason = cause
+        return True
+
+    def step_up(self):
+        for knob in reversed(CPU_ORDER if self.reason in CPU_CAUSES else NETWORK_ORDER):
+            if self.raise_(knob):
+                self.last_up = time.monotonic()
+                if (self.quality, self.fps, self.scale) == (self.max_quality, self.max_fps, 1.0):
+                    # Réglage d'origine retrouvé : délai de remontée normal
+                    self.reason = None
+                    self.hold = self.up_after
+                return True
+        return False
+
+    # Un relevé : mesure, décision, application ; retourne True si le réglage change
+    def tick(self):
+        self.pressures = self.measure()
+        cause, pressure = max(self.pressures.items(), key=lambda item: item[1],
+                              default=(None, 0.0))
+        if pressure >= self.high:
+            self.over, self.under = self.over + 1, 0
+        elif pressure <= self.low:
+            self.over, self.under = 0, self.under + 1
+        else:
+            self.over = self.under = 0
+        if self.over >= self.down_after:
+            changed, direction = self.step_down(cause), f"surcharge {cause}"
+        elif self.under >= self.hold:
+            changed, direction = self.step_up(), "charge faible"
+        else:
+            return False
+        self.over = self.under = 0
+        if not changed:
+            return False
+        self.changes += 1
+        self.camera.adjust(quality=self.quality, fps=self.fps, scale=self.scale)
+        # Les mesures de la période écoulée décrivent l'ancien réglage
+        self.measure()
+        print(f"Flux adapté ({direction}): qualité {self.quality}, {self.fps} FPS, "
+              f"échelle {self.scale}")
+        if self.on_change is not None:
+            self.on_change()
+        return True
+
+    def run(self):
+        while not self.stopped:
+            time.sleep(self.interval)
+            if self.camera.ready.is_set():
+                self.tick()
+
+    def start(self):
+        threading.Thread(target=self.run, name="stream-controller", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopped = True
+
+    def stats(self):
+        pressures = ", ".join(f"{name} {value:.2f}" for name, value in sorted(self.pressures.items()))
+        return (f"qualité {self.quality}, {self.fps} FPS, échelle {self.scale}, "
+                f"{self.changes} changements ; pressions: {pressures or 'aucune'}")
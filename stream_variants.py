@@ -0,0 +1,147 @@
+# stream_variants.py - variantes du flux vidéo par client (?w=320&q=50&fps=5)
+# Chaque variante n'est réencodée qu'une fois par frame capturée, quel que soit
+# le nombre de clients qui la regardent ; les variantes inutilisées sont
+# évincées (LRU) au-delà de max_variants.
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from frame_transport import jpeg_size
+
+
+class StreamVariant:
+    def __init__(self, width, quality, fps, source_width):
+        self.key = (width, quality, fps)
+        self.width = width
+        self.source_width = source_width
+        self.quality = quality
+        self.fps = fps
+        self.condition = threading.Condition()
+        self.seq = 0       # Frame source de la dernière image encodée
+        self.frame = None
+        self.encoding = 0  # Frame source en cours d'encodage (0 : aucune)
+        self.failed = 0    # Dernière frame source illisible
+        self.subscribers = 0
+        self.encoded = 0
+
+    # Retourne (seq, frame encodée) pour cette variante, frame None si le JPEG
+    # source est illisible. Seul le premier client qui demande une nouvelle
+    # frame source paie le décodage/réencodage, hors verrou ; les autres
+    # clients de la variante attendent son résultat.
+    def render(self, seq, jpeg):
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq >= seq or self.encoding != seq, timeout=1.0)
+            if self.seq >= seq:
+                return self.seq, self.frame
+            if self.failed == seq:
+                return seq, None
+            self.encoding = seq
+        frame = self.transcode(jpeg)
+        with self.condition:
+            if frame is None:
+                self.failed = max(self.failed, seq)
+            elif seq > self.seq:
+                self.frame, self.seq = frame, seq
+                self.encoded += 1
+            if self.encoding == seq:
+                self.encoding = 0
+            self.condition.notify_all()
+            return (self.seq, self.frame) if frame is not None else (seq, None)
+
+    def transcode(self, jpeg):
+        # Import différé : OpenCV n'est chargé que si une variante est demandée
+        import cv2
+        import numpy as np
+
+        data = np.frombuffer(jpeg, dtype=np.uint8)
+        # Largeur lue dans le JPEG : le flux adaptatif peut réduire la résolution
+        source_width = (jpeg_size(jpeg) or (self.source_width, 0))[0]
+        # Décoder directement à résolution réduite quand c'est possible
+        flag = cv2.IMREAD_COLOR
+        for factor, reduced in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if source_width // factor >= self.width:
+                flag = reduced
+                break
+        image = cv2.imdecode(data, flag)
+        if image is None:
+            return None  # JPEG tronqué ou corrompu : frame sautée
+        if image.shape[1] != self.width:
+            height = max(1, round(image.shape[0] * self.width / image.shape[1]))
+            image = cv2.resize(image, (self.width, height), interpolation=cv2.INTER_AREA)
+        _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return buffer.tobytes()
+
+
+class VariantCache:
+    def __init__(self, hub, max_width, max_fps, max_variants=8):
+        self.hub = hub
+        self.max_width = max_width
+        self.max_fps = max_fps
+        self.max_variants = max_variants
+        self.variants = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Lit w/q/fps dans les paramètres de la requête ; None = flux d'origine
+    def from_args(self, query, default_quality):
+        if not any(name in query for name in ('w', 'q', 'fps')):
+            return None
+        try:
+            width = int(query.get('w', self.max_width))
+            quality = int(query.get('q', default_quality))
+            rate = float(query.get('fps', self.max_fps))
+            if not math.isfinite(rate):
+                raise ValueError(rate)
+        except ValueError:
+            return None  # Paramètre invalide : flux d'origine
+        # Valeurs bornées et arrondies pour limiter le nombre de variantes
+        width = min(max(80, width // 16 * 16), self.max_width)
+        quality = min(max(10, quality // 5 * 5), 95)
+        rate = min(max(1, round(rate)), self.max_fps)
+        if width == self.max_width and rate == self.max_fps and quality == default_quality:
+            return None
+        return self.get((width, quality, rate))
+
+    def get(self, key):
+        with self.lock:
+            variant = self.variants.get(key)
+            if variant is None:
+                variant = self.variants[key] = StreamVariant(*key, self.max_width)
+            self.variants.move_to_end(key)
+            variant.subscribers += 1
+            self._evict()
+            return variant
+
+    def release(self, variant):
+        with self.lock:
+            variant.subscribers -= 1
+
+    # Évince les variantes les moins récemment utilisées sans client
+    def _evict(self):
+        for key in list(self.variants):
+            if len(self.variants) <= self.max_variants:
+                break
+            if self.variants[key].subscribers == 0:
+                del self.variants[key]
+
+    # Générateur de frames d'une variante, au fps demandé
+    def subscribe(self, variant):
+        period = 1 / variant.fps
+        next_time = 0.0
+        seq = 0
+        try:
+            while not self.hub.closed:
+                # Pas plus vite que le fps de la variante, puis la frame la plus récente
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                seq, jpeg = self.hub.wait_next(seq, timeout=5.0)
+                if jpeg is None:
+                    continue
+                next_time = max(next_time + period, time.monotonic())
+                rendered, frame = variant.render(seq, jpeg)
+                if frame is not None:
+                    yield rendered, frame
+        finally:
+            self.release(variant)
@@ -0,0 +1,58 @@
+# streaming_output.py - sortie de l'encodeur JPEG avec au plus une copie par frame
+import io
+import threading
+import time
+
+SOI = b'\xff\xd8'  # Début d'image JPEG
+EOI = b'\xff\xd9'  # Fin d'image JPEG
+
+
+class StreamingOutput(io.BufferedIOBase):
+    # Les frames publiées (self.frame, hub) sont toujours des bytes immuables :
+    # un lecteur peut les garder aussi longtemps qu'il veut (anneau des clips,
+    # clients lents) sans qu'elles changent sous lui.
+    #   - frame complète reçue en bytes : remise par référence, aucune copie ;
+    #   - tampon réutilisé par l'encodeur : une seule copie (bytes(buf)) ;
+    #   - frame découpée en plusieurs écritures : morceaux gardés puis joints.
+    def __init__(self, hub=None):
+        self.frame = None  # bytes de la dernière frame complète
+        self.hub = hub
+        self.condition = threading.Condition()
+        self.parts = []  # Morceaux de la frame en cours
+        self.started = 0.0  # Arrivée du début de la frame courante (heure de capture approchée)
+        self.frames = 0
+        self.bytes_copied = 0
+
+    def _keep(self, buf):
+        if isinstance(buf, bytes):
+            return buf
+        self.bytes_copied += len(buf)
+        return bytes(buf)
+
+    def _complete(self, frame):
+        with self.condition:
+            self.frame = frame
+            self.frames += 1
+            self.condition.notify_all()
+        if self.hub is not None:
+            self.hub.publish(frame, self.started)
+
+    def write(self, buf):
+        n = len(buf)
+        if buf[:2] == SOI:
+            self.started = time.time()
+            self.parts = [self._keep(buf)]
+        elif self.parts:
+            # Suite d'une frame découpée en plusieurs écritures
+            self.parts.append(self._keep(buf))
+        else:
+            return n
+        if buf[-2:] == EOI:
+            if len(self.parts) == 1:
+                frame = self.parts[0]
+            else:
+                frame = b''.join(self.parts)
+                self.bytes_copied += len(frame)
+            self.parts = []
+            self._complete(frame)
+        return n
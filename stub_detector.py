@@ -0,0 +1,53 @@
+# stub_detector.py - faux modèle YOLO à latence configurable (bancs d'essai sans try.pt)
+import sys
+import time
+import types
+
+
+class StubBoxes:
+    def __init__(self):
+        self.xyxy = []
+        self.conf = []
+        self.cls = []
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+class StubResult:
+    def __init__(self, image):
+        self.orig_img = image
+        self.boxes = StubBoxes()
+
+    def plot(self):
+        return self.orig_img.copy()
+
+
+class StubYOLO:
+    # latency : durée fixe d'un appel à predict, per_image : coût par image du lot
+    latency = 0.05
+    per_image = 0.0
+    names = {0: "fire", 1: "smoke"}
+
+    def __init__(self, weights=None, *args, **kwargs):
+        self.weights = weights
+        self.calls = 0
+        self.images = 0
+
+    def predict(self, source=None, conf=0.25, verbose=False, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        time.sleep(self.latency + self.per_image * len(images))
+        self.calls += 1
+        self.images += len(images)
+        return [StubResult(image) for image in images]
+
+    __call__ = predict
+
+
+# Installe un module ultralytics factice dont YOLO est StubYOLO
+def install_fake_ultralytics(latency=0.05, per_image=0.0):
+    StubYOLO.latency = latency
+    StubYOLO.per_image = per_image
+    module = types.ModuleType("ultralytics")
+    module.YOLO = StubYOLO
+    sys.modules["ultralytics"] = module
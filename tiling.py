@@ -0,0 +1,179 @@
+# tiling.py - inférence par tuiles sur les images haute résolution
+# YOLO réduit l'image entière à 640 px : un panache lointain ne fait plus que
+# quelques pixels. On découpe la frame pleine résolution en tuiles qui se
+# recouvrent, on n'envoie au modèle que les tuiles qui ont changé ou qui
+# contiennent des couleurs de flamme (plus une vue d'ensemble réduite pour
+# les gros objets quand la scène bouge, ou au battement de cœur), puis on
+# fusionne les détections par NMS entre tuiles.
+# Le coût suit donc l'activité de la scène, pas le nombre de pixels.
+import time
+
+import cv2
+import numpy as np
+
+from gating import fire_mask
+
+
+# Tuiles (x1, y1, x2, y2) de côté tile qui couvrent l'image avec un recouvrement
+def make_tiles(width, height, tile=640, overlap=0.2):
+    def starts(length):
+        if length <= tile:
+            return [0]
+        count = int(np.ceil((length - tile) / (tile * (1 - overlap)))) + 1
+        return [round(i * (length - tile) / (count - 1)) for i in range(count)]
+
+    return [(x, y, min(x + tile, width), min(y + tile, height))
+            for y in starts(height) for x in starts(width)]
+
+
+# Fusion gloutonne par classe : une boîte coupée par le bord d'une tuile est
+# presque entièrement contenue dans la boîte vue par la tuile voisine, d'où
+# l'intersection rapportée à la plus petite des deux plutôt que l'IoU
+def merge_detections(boxes, confs, classes, threshold=0.5):
+    kept = []
+    merged = boxes.copy()
+    for i in np.argsort(-confs):
+        for k in kept:
+            if classes[k] != classes[i]:
+                continue
+            top_left = np.maximum(merged[k, :2], boxes[i, :2])
+            bottom_right = np.minimum(merged[k, 2:], boxes[i, 2:])
+            inter = np.prod(np.clip(bottom_right - top_left, 0, None))
+            smaller = min(np.prod(merged[k, 2:] - merged[k, :2]), np.prod(boxes[i, 2:] - boxes[i, :2]))
+            if inter >= threshold * max(smaller, 1e-6):
+                merged[k, :2] = np.minimum(merged[k, :2], boxes[i, :2])
+                merged[k, 2:] = np.maximum(merged[k, 2:], boxes[i, 2:])
+                break
+        else:
+            kept.append(i)
+    kept = np.asarray(sorted(kept), dtype=int)
+    return merged[kept], confs[kept], classes[kept]
+
+
+class TiledBoxes:
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+# Résultat fusionné, utilisable comme un résultat Ultralytics (boxes, plot)
+class TiledResult:
+    def __init__(self, image, boxes, confs, classes, names=None, tiles=()):
+        self.orig_img = image
+        self.boxes = TiledBoxes(boxes, confs, classes)
+        self.names = names or {}
+        self.tiles = tiles  # Tuiles analysées, pour l'affichage
+
+    def plot(self):
+        image = self.orig_img.copy()
+        for x1, y1, x2, y2 in self.tiles:
+            cv2.rectangle(image, (x1, y1), (x2 - 1, y2 - 1), (80, 80, 80), 1)
+        for box, conf, cls in zip(self.boxes.xyxy, self.boxes.conf, self.boxes.cls):
+            x1, y1, x2, y2 = np.round(box).astype(int)
+            cv2.rectangle(image, (x1, y1), (x2, y2), (0, 0, 255), 2)
+            cv2.putText(image, f"{self.names.get(int(cls), int(cls))} {conf:.2f}",
+                        (x1, max(y1 - 6, 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1,
+                        cv2.LINE_AA)
+        return image
+
+
+class TiledDetector:
+    # Mêmes scores que MotionFireGate (gating.py), mais calculés par tuile sur
+    # une version réduite de la frame : une seule conversion par frame.
+    # Seuils plus bas que pour la frame entière : un panache lointain ne couvre
+    # qu'une dizaine de pixels de l'image réduite d'une tuile.
+    # heartbeat : chaque tuile est revue au moins toutes les heartbeat secondes
+    def __init__(self, tile=640, overlap=0.2, scale=8, motion_threshold=0.002,
+                 fire_threshold=0.0005, heartbeat=10.0, pixel_delta=25, overview=True,
+                 merge_threshold=0.5):
+        self.tile = tile
+        self.overlap = overlap
+        self.scale = scale
+        self.motion_threshold = motion_threshold
+        self.fire_threshold = fire_threshold
+        self.heartbeat = heartbeat
+        self.pixel_delta = pixel_delta
+        self.overview = overview  # Vue d'ensemble réduite pour les objets plus grands qu'une tuile
+        self.merge_threshold = merge_threshold
+        self.tiles = []
+        self.reference = None  # Image réduite à la dernière inférence de chaque tuile
+        self.last_pass = []
+        self.last_overview = 0.0
+        self.inferred = 0
+        self.skipped = 0
+
+    def setup(self, width, height):
+        self.tiles = make_tiles(width, height, self.tile, self.overlap)
+        self.reference = None
+        self.last_pass = [0.0] * len(self.tiles)
+
+    # Tuiles à analyser pour cette frame ; la vue d'ensemble est la frame entière
+    def plan(self, image, now=None):
+        now = time.time() if now is None else now
+        height, width = image.shape[:2]
+        if not self.tiles or self.tiles[-1][2:] != (width, height):
+            self.setup(width, height)
+        small = np.ascontiguousarray(image[::self.scale, ::self.scale])
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+        fire = fire_mask(cv2.cvtColor(small, cv2.COLOR_BGR2HSV))
+        if self.reference is None:
+            motion = np.ones(gray.shape, dtype=bool)
+            self.reference = gray.copy()
+        else:
+            motion = np.abs(gray - self.reference) > self.pixel_delta
+        selected = []
+        active = False  # Au moins une tuile retenue pour son mouvement ou sa couleur
+        for index, (x1, y1, x2, y2) in enumerate(self.tiles):
+            region = (slice(y1 // self.scale, -(-y2 // self.scale)),
+                      slice(x1 // self.scale, -(-x2 // self.scale)))
+            size = max(motion[region].size, 1)
+            hit = (np.count_nonzero(motion[region]) / size >= self.motion_threshold or
+                   np.count_nonzero(fire[region]) / size >= self.fire_threshold)
+            active = active or hit
+            if hit or now - self.last_pass[index] >= self.heartbeat:
+                selected.append(index)
+                # Référence mise à jour seulement là où le modèle a regardé
+                self.reference[region] = gray[region]
+                self.last_pass[index] = now
+        self.inferred += len(selected)
+        self.skipped += len(self.tiles) - len(selected)
+        tiles = [self.tiles[index] for index in selected]
+        # Vue d'ensemble seulement si la scène bouge : une scène statique ne
+        # paie que le battement de cœur
+        if self.overview and len(self.tiles) > 1 and (
+                active or now - self.last_overview >= self.heartbeat):
+            tiles.append((0, 0, width, height))
+            self.last_overview = now
+        return tiles
+
+    @staticmethod
+    def crops(image, tiles):
+        return [image[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+
+    # Remet les détections de chaque tuile dans le repère de la frame et fusionne
+    def merge(self, image, tiles, detections, names=None):
+        boxes, confs, classes = [], [], []
+        for (x1, y1, _, _), (tile_boxes, tile_confs, tile_classes) in zip(tiles, detections):
+            if len(tile_boxes):
+                boxes.append(tile_boxes + np.array([x1, y1, x1, y1], dtype=np.float32))
+                confs.append(tile_confs)
+                classes.append(tile_classes)
+        if boxes:
+            boxes, confs, classes = merge_detections(np.concatenate(boxes), np.concatenate(confs),
+                                                     np.concatenate(classes), self.merge_threshold)
+        else:
+            boxes = np.zeros((0, 4), np.float32)
+            confs = np.zeros(0, np.float32)
+            classes = np.zeros(0, int)
+        shown = [tile for tile in tiles if tile != (0, 0) + image.shape[1::-1]]
+        return TiledResult(image, boxes, confs, classes, names, shown)
+
+    def stats(self):
+        total = self.inferred + self.skipped
+        share = self.inferred / total if total else 0.0
+        return (f"tuiles: {len(self.tiles)} par frame, {self.inferred} analysées, "
+                f"{self.skipped} ignorées ({share:.0%} analysées)")
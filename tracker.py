@@ -0,0 +1,193 @@
+# tracker.py - YOLO toutes les N frames, suivi par flux optique entre les deux
+# Les boîtes détectées sont propagées d'une frame à l'autre par Lucas-Kanade
+# (points d'intérêt dans chaque boîte, déplacement et échelle médians). Chaque
+# piste garde un identifiant, ce qui permet de mesurer la persistance et la
+# croissance d'un foyer. Une détection complète est relancée toutes les
+# `every` frames, ou plus tôt si le suivi d'une piste se dégrade.
+import cv2
+import numpy as np
+
+
+# IoU entre deux ensembles de boîtes (x1, y1, x2, y2) : matrice len(a) x len(b)
+def box_iou(a, b):
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+def to_numpy(values):
+    if hasattr(values, 'cpu'):
+        values = values.cpu().numpy()
+    return np.asarray(values, dtype=np.float32)
+
+
+# Boîtes, confiances et classes d'un résultat Ultralytics
+def detections_from(result):
+    boxes = result.boxes
+    return (to_numpy(boxes.xyxy).reshape(-1, 4), to_numpy(boxes.conf).reshape(-1),
+            to_numpy(boxes.cls).reshape(-1).astype(int))
+
+
+class Track:
+    def __init__(self, track_id, box, cls, conf, frame):
+        self.id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.cls = int(cls)
+        self.conf = float(conf)           # Confiance courante (baisse si le suivi se dégrade)
+        self.detected_conf = float(conf)  # Confiance de la dernière détection
+        self.first_frame = frame
+        self.first_area = self.area()
+        self.frames = 0   # Frames où la piste existe (persistance)
+        self.misses = 0   # Détections complètes consécutives sans correspondance
+
+    def area(self):
+        width, height = self.box[2:] - self.box[:2]
+        return float(max(width, 0) * max(height, 0))
+
+    # Rapport de surface depuis la première détection (un feu qui grandit > 1)
+    def growth(self):
+        return self.area() / self.first_area if self.first_area else 1.0
+
+
+class BoxTracker:
+    # every : une détection complète toutes les every frames
+    # min_quality : relance la détection si une piste tombe sous cette fraction
+    #               de sa confiance détectée
+    # scale : facteur de réduction de l'image pour le flux optique
+    def __init__(self, every=5, min_quality=0.6, iou_threshold=0.3, max_misses=2, scale=0.5):
+        self.every = every
+        self.min_quality = min_quality
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.scale = scale
+        self.tracks = []
+        self.next_id = 1
+        self.frame = 0
+        self.since_detection = None
+        self.previous = None  # Image précédente en niveaux de gris (réduite)
+        self.detections = 0
+        self.propagations = 0
+
+    def needs_detection(self):
+        if self.previous is None or self.since_detection is None:
+            return True
+        if self.since_detection >= self.every - 1:
+            return True
+        return any(track.conf < self.min_quality * track.detected_conf for track in self.tracks)
+
+    # image : frame BGR ; boxes/confs/classes : résultat de la détection
+    # complète, ou None pour une frame où l'on se contente de suivre
+    def update(self, image, boxes=None, confs=None, classes=None):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if self.scale != 1:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale,
+                              interpolation=cv2.INTER_AREA)
+        if self.previous is not None and self.tracks:
+            self.propagate(gray)
+        if boxes is not None:
+            self.associate(boxes, confs, classes)
+            self.since_detection = 0
+            self.detections += 1
+        else:
+            self.since_detection += 1
+            self.propagations += 1
+        for track in self.tracks:
+            track.frames += 1
+        self.previous = gray
+        self.frame += 1
+        return self.tracks
+
+    def propagate(self, gray):
+        height, width = gray.shape
+        for track in self.tracks:
+            x1, y1, x2, y2 = np.round(track.box * self.scale).astype(int)
+            x1, y1 = max(x1, 0), max(y1, 0)
+            x2, y2 = min(x2, width), min(y2, height)
+            if x2 - x1 < 4 or y2 - y1 < 4:
+                track.conf *= 0.5
+                continue
+            points = cv2.goodFeaturesToTrack(self.previous[y1:y2, x1:x2], maxCorners=40,
+                                             qualityLevel=0.01, minDistance=3)
+            if points is None:
+                # Région sans texture (flamme saturée...) : on garde la boîte
+                track.conf *= 0.8
+                continue
+            old = points.reshape(-1, 2) + (x1, y1)
+            new, status, _ = cv2.calcOpticalFlowPyrLK(self.previous, gray,
+                                                      old.reshape(-1, 1, 2).astype(np.float32),
+                                                      None, winSize=(15, 15), maxLevel=2)
+            good = status.reshape(-1) == 1
+            quality = good.mean()
+            track.conf *= quality
+            if good.sum() < 3:
+                continue
+            old, new = old[good], new.reshape(-1, 2)[good]
+            shift = np.median(new - old, axis=0) / self.scale
+            # Échelle : rapport médian des distances au centre des points
+            spread_old = np.linalg.norm(old - old.mean(axis=0), axis=1)
+            spread_new = np.linalg.norm(new - new.mean(axis=0), axis=1)
+            valid = spread_old > 1
+            ratio = np.median(spread_new[valid] / spread_old[valid]) if valid.sum() >= 3 else 1.0
+            ratio = float(np.clip(ratio, 0.8, 1.25))
+            center = (track.box[:2] + track.box[2:]) / 2 + shift
+            half = (track.box[2:] - track.box[:2]) / 2 * ratio
+            track.box = np.concatenate([center - half, center + half]).astype(np.float32)
+
+    # Associe les détections aux pistes (IoU glouton) et crée les nouvelles pistes
+    def associate(self, boxes, confs, classes):
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        matched_tracks, matched_boxes = set(), set()
+        if self.tracks and len(boxes):
+            iou = box_iou([track.box for track in self.tracks], boxes)
+            for flat in np.argsort(-iou, axis=None):
+                t, d = np.unravel_index(flat, iou.shape)
+                if iou[t, d] < self.iou_threshold:
+                    break
+                if t in matched_tracks or d in matched_boxes:
+                    continue
+                matched_tracks.add(t)
+                matched_boxes.add(d)
+                track = self.tracks[t]
+                track.box = boxes[d].copy()
+                track.conf = track.detected_conf = float(confs[d])
+                track.cls = int(classes[d])
+                track.misses = 0
+        survivors = []
+        for index, track in enumerate(self.tracks):
+            if index not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+            survivors.append(track)
+        for d in range(len(boxes)):
+            if d not in matched_boxes:
+                survivors.append(Track(self.next_id, boxes[d], classes[d], confs[d], self.frame))
+                self.next_id += 1
+        self.tracks = survivors
+
+    # Pistes confirmées (vues à la dernière détection) pour l'affichage
+    def snapshot(self):
+        return [(track.id, track.box.copy(), track.cls, track.conf, track.growth())
+                for track in self.tracks if track.misses == 0]
+
+    def stats(self):
+        total = self.detections + self.propagations
+        share = self.detections / total if total else 0.0
+        return (f"détections={self.detections} suivies={self.propagations} "
+                f"({share:.0%} des frames analysées par YOLO) pistes={len(self.tracks)}")
+
+
+# Dessine les pistes (identifiant, classe, confiance, croissance)
+def draw_tracks(image, tracks, names=None):
+    for track_id, box, cls, conf, growth in tracks:
+        x1, y1, x2, y2 = np.round(box).astype(int)
+        label = names[cls] if names else str(cls)
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        cv2.putText(image, f"#{track_id} {label} {conf:.2f} x{growth:.1f}", (x1, max(y1 - 6, 12)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1, cv2.LINE_AA)
+    return image